@@ -0,0 +1,6 @@
+"""
+Shared image, video and text analysis core behind api_backend.py (full profile)
+and api_backend_lite.py (lite profile)
+"""
+
+from .server import create_app
@@ -0,0 +1,151 @@
+"""
+Admission control for the API: bounded work pools with a short wait queue
+Requests beyond a pool's slots wait briefly in its queue; when the queue is full, or
+the wait runs out, they get an immediate 503 with a Retry-After estimate.
+'inference' covers detection / OCR work, 'cheap' covers metadata-only work.
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from functools import wraps
+
+import cv2
+from flask import Response, jsonify
+
+from . import metrics, scheduler
+from .config import settings
+
+class Saturated(Exception):
+    def __init__(self, pool, retry_after):
+        super().__init__(f"The {pool} pool is saturated; retry in {retry_after}s")
+        self.pool = pool
+        self.retry_after = retry_after
+
+class WorkPool:
+    """A fixed number of concurrent slots plus at most `queue_size` waiters"""
+
+    def __init__(self, name, slots, queue_size, wait_seconds):
+        self.name = name
+        self.slots = slots
+        self.queue_size = queue_size
+        self.wait_seconds = wait_seconds
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._service_seconds = None  # moving average of time a slot is held
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from the average service time and the queue"""
+        with self._lock:
+            service = self._service_seconds or 1.0
+            return max(1, min(60, math.ceil(service * (self._waiting + 1) / self.slots)))
+
+    def acquire(self):
+        """Take a slot, waiting up to wait_seconds if the queue has room; raises Saturated"""
+        if self._semaphore.acquire(blocking=False):
+            return time.perf_counter()
+
+        with self._lock:
+            full = self._waiting >= self.queue_size
+            if not full:
+                self._waiting += 1
+        if full:
+            metrics.admission_rejections.inc(pool=self.name, reason='queue_full')
+            raise Saturated(self.name, self.retry_after())
+
+        try:
+            with metrics.stage_timer(f'admission_wait_{self.name}'):
+                acquired = self._semaphore.acquire(timeout=self.wait_seconds)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            metrics.admission_rejections.inc(pool=self.name, reason='wait_timeout')
+            raise Saturated(self.name, self.retry_after())
+        return time.perf_counter()
+
+    def release(self, acquired_at):
+        elapsed = time.perf_counter() - acquired_at
+        with self._lock:
+            self._service_seconds = elapsed if self._service_seconds is None else 0.8 * self._service_seconds + 0.2 * elapsed
+        self._semaphore.release()
+
+    def describe(self):
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'queue_size': self.queue_size,
+                'waiting': self._waiting,
+                'avg_service_seconds': round(self._service_seconds, 3) if self._service_seconds is not None else None
+            }
+
+pools = {}
+
+def configure():
+    """Create the pools from settings and size torch/OpenCV thread pools to the inference slots"""
+    pools['inference'] = WorkPool('inference', settings['INFERENCE_SLOTS'], settings['INFERENCE_QUEUE'],
+                                  settings['INFERENCE_WAIT_SECONDS'])
+    pools['cheap'] = WorkPool('cheap', settings['CHEAP_SLOTS'], settings['CHEAP_QUEUE'], settings['CHEAP_WAIT_SECONDS'])
+    configure_threads()
+
+def configure_threads():
+    """Give each inference slot an equal share of the cores instead of every request using all of them.
+
+    The OpenMP/MKL variables must be set before torch is first imported, which
+    the lazy model loaders guarantee; apply_torch_threads covers a torch that
+    is already loaded.
+    """
+    threads = str(settings['INFERENCE_THREADS'])
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ.setdefault(variable, threads)
+    cv2.setNumThreads(settings['INFERENCE_THREADS'])
+    apply_torch_threads()
+
+def apply_torch_threads():
+    """Set torch intra-op threads once torch has been imported by a model loader"""
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.get_num_threads() != settings['INFERENCE_THREADS']:
+        torch.set_num_threads(settings['INFERENCE_THREADS'])
+
+def busy_response(error):
+    response = jsonify({'error': str(error), 'pool': error.pool, 'retry_after': error.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def limit(pool):
+    """Decorator for Flask views: run the view holding a slot of `pool`.
+
+    `pool` is a pool name or a function of the current request returning one.
+    Streamed responses keep their slot until the stream is closed. Stage graphs
+    run by the view draw on that pool's stage slots.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            work_pool = pools[pool() if callable(pool) else pool]
+            try:
+                acquired_at = work_pool.acquire()
+            except Saturated as e:
+                return busy_response(e)
+
+            release_on_close = False
+            token = scheduler.current_pool.set(work_pool.name)
+            try:
+                response = func(*args, **kwargs)
+                if isinstance(response, Response) and response.is_streamed:
+                    response.call_on_close(lambda: work_pool.release(acquired_at))
+                    release_on_close = True
+                return response
+            finally:
+                scheduler.current_pool.reset(token)
+                if not release_on_close:
+                    work_pool.release(acquired_at)
+        return wrapper
+    return decorator
+
+def describe():
+    return {name: work_pool.describe() for name, work_pool in pools.items()}
@@ -0,0 +1,153 @@
+"""
+Settings shared by the analysis modules, read from the environment at import
+create_app copies them into app.config; code that also runs outside a request
+(warm-up, batch jobs) reads them from here
+"""
+
+import os
+
+CPU_COUNT = os.cpu_count() or 1
+INFERENCE_SLOTS = int(os.environ.get('ASTRA_INFERENCE_SLOTS', max(1, CPU_COUNT // 4)))
+# Files the API generates (results database, thumbnails, exported models) default to here
+DATA_DIR = os.environ.get('ASTRA_DATA_DIR', 'data')
+
+def parse_overrides(value):
+    """Parse 'key=value,...' into a dict, e.g. 'ocr=none,pose=mediapipe'"""
+    overrides = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            overrides[key.strip()] = value.strip()
+    return overrides
+
+settings = {
+    'DATA_DIR': DATA_DIR,
+    'UPLOAD_FOLDER': 'uploads',
+    'MAX_CONTENT_LENGTH': 500 * 1024 * 1024,  # 500MB max per request body
+
+    # Resumable chunked uploads (/api/uploads): total size limit, suggested chunk size,
+    # and how long unfinished or unclaimed uploads are kept
+    'UPLOAD_MAX_BYTES': int(os.environ.get('ASTRA_UPLOAD_MAX_MB', 8192)) * 1024 * 1024,
+    'UPLOAD_CHUNK_BYTES': 8 * 1024 * 1024,
+    'UPLOAD_TTL_SECONDS': int(os.environ.get('ASTRA_UPLOAD_TTL_SECONDS', 24 * 3600)),
+
+    # Video frame thumbnails: max side in pixels per stored size (0 keeps the original
+    # resolution), and whether frames come back as thumbnail 'url's or 'inline' base64
+    'THUMBNAIL_FOLDER': os.environ.get('THUMBNAIL_FOLDER', os.path.join(DATA_DIR, 'thumbnails')),
+    'THUMBNAIL_SIZES': [int(size) for size in os.environ.get('THUMBNAIL_SIZES', '320,0').split(',')],
+    'THUMBNAIL_TTL_SECONDS': int(os.environ.get('THUMBNAIL_TTL_SECONDS', 24 * 3600)),
+    'THUMBNAIL_JPEG_QUALITY': 85,
+    'FRAME_DELIVERY': os.environ.get('FRAME_DELIVERY', 'url'),
+
+    'ADMIN_TOKEN': os.environ.get('ASTRA_ADMIN_TOKEN'),  # enables ?profile=1 for callers that send it
+    'WARMUP': os.environ.get('ASTRA_WARMUP', '0') == '1',  # load models in the background at startup
+
+    # Deployment profile ('full' or 'lite') and optional overrides of its budgets
+    'PROFILE': os.environ.get('ASTRA_PROFILE', 'full'),
+    'MEMORY_BUDGET_MB': int(os.environ['ASTRA_MEMORY_BUDGET_MB']) if os.environ.get('ASTRA_MEMORY_BUDGET_MB') else None,
+    'CPU_BUDGET': int(os.environ['ASTRA_CPU_BUDGET']) if os.environ.get('ASTRA_CPU_BUDGET') else None,
+    'ENGINES': parse_overrides(os.environ.get('ASTRA_ENGINES')),  # stage=engine, or stage=none to disable
+
+    # Model lifecycle: unload models idle this long (per model family overrides such as
+    # 'easyocr=300,yolo=1800'), and unload least recently used models while process RSS
+    # exceeds the budget (defaults to the profile's rss_budget_mb)
+    'MODEL_IDLE_SECONDS': int(os.environ.get('ASTRA_MODEL_IDLE_SECONDS', 900)),
+    'MODEL_IDLE_TIMEOUTS': parse_overrides(os.environ.get('ASTRA_MODEL_IDLE_TIMEOUTS')),
+    'MODEL_RSS_BUDGET_MB': int(os.environ['ASTRA_RSS_BUDGET_MB']) if os.environ.get('ASTRA_RSS_BUDGET_MB') else None,
+    'MODEL_SWEEP_SECONDS': 30,
+
+    # Admission control: concurrent requests per pool, how many more may wait, and for
+    # how long, before a 503. Each inference slot gets INFERENCE_THREADS torch/OpenCV threads
+    'INFERENCE_SLOTS': INFERENCE_SLOTS,
+    'INFERENCE_THREADS': int(os.environ.get('ASTRA_INFERENCE_THREADS', max(1, CPU_COUNT // INFERENCE_SLOTS))),
+    'INFERENCE_QUEUE': int(os.environ.get('ASTRA_INFERENCE_QUEUE', 4)),
+    'INFERENCE_WAIT_SECONDS': float(os.environ.get('ASTRA_INFERENCE_WAIT_SECONDS', 10)),
+    'CHEAP_SLOTS': int(os.environ.get('ASTRA_CHEAP_SLOTS', CPU_COUNT * 2)),
+    'CHEAP_QUEUE': int(os.environ.get('ASTRA_CHEAP_QUEUE', 32)),
+    'CHEAP_WAIT_SECONDS': float(os.environ.get('ASTRA_CHEAP_WAIT_SECONDS', 5)),
+
+    # Stage gating: stage=signal rules that skip a stage when an image lacks the signal
+    # (person / vehicle from YOLO, text from MSER proposals); ASTRA_GATING adds or
+    # replaces rules, stage=always removes one
+    'GATING_RULES': {'hands': 'person', 'pose': 'person', 'ocr': 'text', 'plates': 'vehicle',
+                     **parse_overrides(os.environ.get('ASTRA_GATING'))},
+
+    # Image stage graph: stages running at once across inference / cheap requests and
+    # within one request, and per-stage timeouts ('objects=20,pose=5') over the default,
+    # counted from when a stage starts; timed-out stages are left out
+    'STAGE_WORKERS': int(os.environ.get('ASTRA_STAGE_WORKERS', INFERENCE_SLOTS * 6)),
+    'CHEAP_STAGE_WORKERS': int(os.environ.get('ASTRA_CHEAP_STAGE_WORKERS', CPU_COUNT * 4)),
+    'STAGE_REQUEST_WORKERS': int(os.environ.get('ASTRA_STAGE_REQUEST_WORKERS', 6)),
+    'STAGE_TIMEOUT_SECONDS': float(os.environ.get('ASTRA_STAGE_TIMEOUT_SECONDS', 60)),
+    'STAGE_TIMEOUTS': parse_overrides(os.environ.get('ASTRA_STAGE_TIMEOUTS')),
+
+    # Results store: one summary row per analyzed item in this SQLite file ('' disables),
+    # written by a background thread in batches of up to RESULTS_BATCH
+    'RESULTS_DB': os.environ.get('ASTRA_RESULTS_DB', os.path.join(DATA_DIR, 'results.db')),
+    'RESULTS_BATCH': 500,
+    'RESULTS_QUEUE': int(os.environ.get('ASTRA_RESULTS_QUEUE', 10000)),
+
+    # Header-only EXIF reads (/api/metadata) consume at most this much of an upload
+    'EXIF_HEADER_MAX_BYTES': int(os.environ.get('ASTRA_EXIF_HEADER_MAX_KB', 2048)) * 1024,
+
+    # Reduced-resolution decoding: JPEGs are decoded at 1/2, 1/4 or 1/8 scale when a stage
+    # needs no more (YOLO its input size, hashing 64 px); MediaPipe gets a longest side of
+    # at least LANDMARK_DECODE_SIDE
+    'REDUCED_DECODE': os.environ.get('ASTRA_REDUCED_DECODE', '1') == '1',
+    'LANDMARK_DECODE_SIDE': int(os.environ.get('ASTRA_LANDMARK_DECODE_SIDE', 1280)),
+
+    # Directory scans (scan_directory.py): worker processes, each with its own models, and
+    # records per output batch; a checkpoint is written after every batch
+    'SCAN_WORKERS': int(os.environ.get('ASTRA_SCAN_WORKERS', max(1, CPU_COUNT // 4))),
+    'SCAN_COMMIT_EVERY': 200,
+
+    # Video sampling: frames analyzed per video by default and at most (max_frames), and
+    # segment-parallel analysis (segments=N|auto) across VIDEO_WORKERS processes, each
+    # with its own models. Workers seek across gaps longer than VIDEO_SEEK_FRAMES. Without
+    # segments, frames are decoded and analyzed VIDEO_FRAME_CHUNK at a time
+    'VIDEO_FRAMES': int(os.environ.get('ASTRA_VIDEO_FRAMES', 5)),
+    'VIDEO_MAX_FRAMES': int(os.environ.get('ASTRA_VIDEO_MAX_FRAMES', 240)),
+    'VIDEO_SEGMENTS': os.environ.get('ASTRA_VIDEO_SEGMENTS', '1'),
+    'VIDEO_WORKERS': int(os.environ.get('ASTRA_VIDEO_WORKERS', max(1, CPU_COUNT // 4))),
+    'VIDEO_SEEK_FRAMES': 300,
+    'VIDEO_FRAME_CHUNK': 16,
+    # Sampled frames within this mean absolute difference (fraction of full scale, on a
+    # 32x32 grayscale thumbnail) of an analyzed frame reuse its results; 0 disables
+    'VIDEO_DEDUP_THRESHOLD': float(os.environ.get('ASTRA_VIDEO_DEDUP_THRESHOLD', 0.02)),
+    # Dense mode (dense=1): decode VIDEO_DENSE_FPS frames per second, detect on every
+    # VIDEO_DETECT_EVERY-th and track with optical flow in between. Tracks match detections
+    # at VIDEO_TRACK_IOU, end after VIDEO_TRACK_MAX_MISSED keyframes without one and are
+    # counted once detected on VIDEO_TRACK_MIN_HITS keyframes. At most VIDEO_DENSE_MAX_FRAMES
+    # frames are processed, since the request holds an inference slot throughout
+    'VIDEO_DENSE_FPS': float(os.environ.get('ASTRA_VIDEO_DENSE_FPS', 5)),
+    'VIDEO_DETECT_EVERY': int(os.environ.get('ASTRA_VIDEO_DETECT_EVERY', 5)),
+    'VIDEO_TRACK_IOU': 0.3,
+    'VIDEO_TRACK_MAX_MISSED': 2,
+    'VIDEO_TRACK_MIN_HITS': 2,
+    'VIDEO_DENSE_MAX_FRAMES': int(os.environ.get('ASTRA_VIDEO_DENSE_MAX_FRAMES', 3000)),
+
+    # YOLO weights, and where exported ONNX / OpenVINO artifacts are cached. YOLO_INT8
+    # quantizes exported models (dynamic INT8 for ONNX, NNCF post-training for OpenVINO)
+    'YOLO_WEIGHTS': os.environ.get('YOLO_WEIGHTS', 'yolov8n.pt'),
+    'YOLO_EXPORT_DIR': os.environ.get('YOLO_EXPORT_DIR', os.path.join(DATA_DIR, 'models')),
+    'YOLO_IMGSZ': int(os.environ.get('YOLO_IMGSZ', 640)),
+    'YOLO_INT8': os.environ.get('YOLO_INT8', '0') == '1',
+
+    # OCR settings: 'roi' recognizes only proposed text regions, 'full' reads the whole frame
+    'OCR_MODE': os.environ.get('OCR_MODE', 'roi'),
+    'OCR_BATCH_SIZE': int(os.environ.get('OCR_BATCH_SIZE', 16)),  # text lines per recognizer batch
+    'OCR_FRAME_BATCH': int(os.environ.get('OCR_FRAME_BATCH', 4)),  # same-size images per detector pass
+    'OCR_WORKERS': int(os.environ.get('OCR_WORKERS', 0)),  # recognizer DataLoader workers
+    'OCR_DEFAULT_LANGS': os.environ.get('OCR_LANGS', 'en,ch_sim').split(','),
+    # Languages a request may ask for (ocr_langs); each language set is its own reader
+    'OCR_ALLOWED_LANGS': os.environ.get('OCR_ALLOWED_LANGS', 'en,ch_sim,ch_tra,ja,ko,ar,hi,ru,fr,de,es,it,pt').split(','),
+    'OCR_READER_CACHE_MB': int(os.environ.get('OCR_READER_CACHE_MB', 1024)),  # resident reader budget
+    'OCR_LOAD_RETRY_SECONDS': 300,  # how long a failed language set stays failed
+    'OCR_ROI_PROPOSAL_SIZE': 1024,  # max side of the image used for region proposals
+    'OCR_ROI_MAX_REGIONS': 32,
+    'OCR_ROI_MAX_COVERAGE': 0.6,  # fall back to full-frame OCR above this area fraction
+
+    # License plates: 'stage' localizes plates inside vehicle boxes and reads only those,
+    # 'ocr' keeps the old heuristic of classifying any short alphanumeric OCR text as a plate
+    'PLATE_DETECTION': os.environ.get('PLATE_DETECTION', 'stage'),
+}
@@ -0,0 +1,140 @@
+"""
+Pluggable analysis engines and the deployment profiles that choose between them
+Each analysis module registers its engines at import; configure() then picks one
+engine per stage that fits the active profile's memory and CPU budget
+"""
+
+import threading
+
+from .config import settings
+
+# Stages in the order budgets are spent on them: cheap, high-value stages first
+STAGE_PRIORITY = ['objects', 'face', 'hands', 'text_nlp', 'pose', 'ocr', 'plates']
+
+# memory_budget_mb and cpu_budget bound the sum of the selected engines' estimates;
+# rss_budget_mb is the process RSS above which idle models are unloaded (None: no limit);
+# keep_uploads keeps analyzed files in UPLOAD_FOLDER instead of deleting them
+PROFILES = {
+    'full': {'memory_budget_mb': 4096, 'cpu_budget': 32, 'rss_budget_mb': None, 'keep_uploads': True,
+             'service': 'OSINT Image & Video Analysis API'},
+    'lite': {'memory_budget_mb': 600, 'cpu_budget': 10, 'rss_budget_mb': 1024, 'keep_uploads': False,
+             'service': 'OSINT Image Analysis API (lite)'},
+}
+
+ENGINES = {}  # stage -> {engine name: spec}, in registration order
+
+_lock = threading.Lock()
+_active = {'profile': None, 'selection': {}}
+
+def register_engine(stage, name, run, memory_mb, cpu_cost, load=None, requires=()):
+    """Declare an implementation of a stage.
+
+    `memory_mb` and `cpu_cost` are rough resident-size and relative per-call
+    cost estimates used for profile budgeting; `load` pre-loads the model for
+    warm-up; `requires` names stages that must also be selected.
+    """
+    ENGINES.setdefault(stage, {})[name] = {
+        'stage': stage,
+        'name': name,
+        'run': run,
+        'load': load,
+        'memory_mb': memory_mb,
+        'cpu_cost': cpu_cost,
+        'requires': tuple(requires)
+    }
+
+def select_engines(memory_budget_mb, cpu_budget, overrides=None):
+    """Pick one engine per stage in STAGE_PRIORITY order while the budgets allow.
+
+    `overrides` maps a stage to a preferred engine name, or 'none' to leave the
+    stage out. Returns ({stage: spec}, {stage: reason skipped}).
+    """
+    overrides = overrides or {}
+    selected = {}
+    skipped = {}
+    memory_used = 0
+    cpu_used = 0
+
+    stages = STAGE_PRIORITY + [stage for stage in ENGINES if stage not in STAGE_PRIORITY]
+    for stage in stages:
+        candidates = ENGINES.get(stage)
+        if not candidates:
+            continue
+
+        preferred = overrides.get(stage)
+        if preferred == 'none':
+            skipped[stage] = 'disabled'
+            continue
+        if preferred and preferred not in candidates:
+            print(f"[WARNING] Unknown engine {preferred!r} for {stage}; using the default")
+            preferred = None
+        engine = candidates[preferred] if preferred else next(iter(candidates.values()))
+
+        missing = [required for required in engine['requires'] if required not in selected]
+        if missing:
+            skipped[stage] = f"requires {', '.join(missing)}"
+            continue
+        if memory_used + engine['memory_mb'] > memory_budget_mb or cpu_used + engine['cpu_cost'] > cpu_budget:
+            skipped[stage] = 'over budget'
+            continue
+
+        selected[stage] = engine
+        memory_used += engine['memory_mb']
+        cpu_used += engine['cpu_cost']
+
+    return selected, skipped
+
+def configure(profile_name):
+    """Activate a profile and select its engines; returns the profile description"""
+    if profile_name not in PROFILES:
+        raise ValueError(f"Unknown profile {profile_name!r}. Available: {', '.join(PROFILES)}")
+
+    profile = dict(PROFILES[profile_name], name=profile_name)
+    if settings['MEMORY_BUDGET_MB'] is not None:
+        profile['memory_budget_mb'] = settings['MEMORY_BUDGET_MB']
+    if settings['CPU_BUDGET'] is not None:
+        profile['cpu_budget'] = settings['CPU_BUDGET']
+    if settings['MODEL_RSS_BUDGET_MB'] is not None:
+        profile['rss_budget_mb'] = settings['MODEL_RSS_BUDGET_MB']
+
+    selected, skipped = select_engines(profile['memory_budget_mb'], profile['cpu_budget'], settings['ENGINES'])
+    profile['skipped'] = skipped
+    with _lock:
+        _active['profile'] = profile
+        _active['selection'] = selected
+    return profile
+
+def active_profile():
+    return _active['profile']
+
+def enabled(stage):
+    return stage in _active['selection']
+
+def engine_name(stage):
+    engine = _active['selection'].get(stage)
+    return engine['name'] if engine else None
+
+def run(stage, *args, **kwargs):
+    """Run the selected engine for a stage; callers check enabled() first"""
+    return _active['selection'][stage]['run'](*args, **kwargs)
+
+def describe():
+    """Selected engines with their estimates, and skipped stages, for /health"""
+    profile = _active['profile'] or {}
+    return {
+        'selected': {stage: {'engine': engine['name'], 'memory_mb': engine['memory_mb'], 'cpu_cost': engine['cpu_cost']}
+                     for stage, engine in _active['selection'].items()},
+        'skipped': profile.get('skipped', {}),
+        'memory_budget_mb': profile.get('memory_budget_mb'),
+        'cpu_budget': profile.get('cpu_budget')
+    }
+
+def warm_up():
+    """Load every selected engine's model ahead of the first request that needs it"""
+    for stage, engine in list(_active['selection'].items()):
+        if engine['load'] is None:
+            continue
+        try:
+            engine['load']()
+        except Exception as e:
+            print(f"Error warming up {stage} ({engine['name']}): {e}")
@@ -0,0 +1,71 @@
+"""
+Conditional stage execution driven by cheap signals
+A rule names the signal a stage needs, e.g. hands=person or ocr=text; when an image
+lacks the signal the stage is skipped. Every decision is recorded for the output.
+"""
+
+from . import metrics
+from .config import parse_overrides, settings
+from .ocr import VEHICLE_CLASSES, propose_text_regions
+
+SIGNAL_MIN_CONFIDENCE = 0.3
+
+def _has_class(classes, label):
+    def check(image, objects, context):
+        if objects is None:
+            return True, 'not evaluated: objects were not detected'
+        found = sum(1 for obj in objects if obj['class'] in classes and obj['confidence'] >= SIGNAL_MIN_CONFIDENCE)
+        return bool(found), f"{found} {label} detected" if found else f"no {label} detected"
+    return check
+
+def _has_text(image, objects, context):
+    """MSER text proposals; kept in the context so ROI OCR can reuse them"""
+    with metrics.stage_timer('gate_text'):
+        regions = propose_text_regions(image, objects)
+    context['text_regions'] = regions
+    return bool(regions), f"{len(regions)} text region(s) proposed" if regions else 'no text-like regions'
+
+# Signal name -> check(image, objects, context) returning (present, reason)
+SIGNALS = {
+    'person': _has_class({'person'}, 'person'),
+    'vehicle': _has_class(VEHICLE_CLASSES, 'vehicle'),
+    'text': _has_text,
+}
+
+def resolve_rules(override=None):
+    """GATING_RULES with a request's 'stage=signal,...' overrides; 'off' disables gating.
+
+    'always' as a signal removes a stage's rule. Raises ValueError for unknown signals.
+    """
+    if override == 'off':
+        return {}
+    rules = dict(settings['GATING_RULES'])
+    rules.update(parse_overrides(override))
+    unknown = sorted({signal for signal in rules.values() if signal not in SIGNALS and signal != 'always'})
+    if unknown:
+        raise ValueError(f"Unknown gating signal(s): {', '.join(unknown)}. Available: {', '.join(SIGNALS)}, always")
+    return {stage: signal for stage, signal in rules.items() if signal != 'always'}
+
+def evaluate(rules, stages, image, objects=None):
+    """Decide which of `stages` to run on an image.
+
+    Returns ({stage: {'run', 'signal', 'reason'}}, context); each signal is
+    checked at most once, and the context carries by-products such as
+    `text_regions`.
+    """
+    decisions = {}
+    context = {}
+    checked = {}
+    for stage in stages:
+        signal = rules.get(stage)
+        if signal is None:
+            continue
+        if signal not in checked:
+            checked[signal] = SIGNALS[signal](image, objects, context)
+        present, reason = checked[signal]
+        decisions[stage] = {'run': present, 'signal': signal, 'reason': reason}
+        metrics.stage_gating.inc(stage=stage, decision='run' if present else 'skip')
+    return decisions, context
+
+def skipped(decisions):
+    return {stage for stage, decision in decisions.items() if not decision['run']}
@@ -0,0 +1,51 @@
+"""
+Great-circle distance and bounding boxes for proximity queries
+Boxes are (min_lat, min_lon, max_lat, max_lon) in decimal degrees and never cross the
+antimeridian; a region that does is split into two boxes.
+"""
+
+import math
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def validate_point(lat, lon):
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('lat must be within [-90, 90] and lon within [-180, 180]')
+
+def split_box(min_lat, min_lon, max_lat, max_lon):
+    """A box as index-ready boxes; min_lon > max_lon means it crosses the antimeridian"""
+    validate_point(min_lat, min_lon)
+    validate_point(max_lat, max_lon)
+    if min_lat > max_lat:
+        raise ValueError('min_lat must not exceed max_lat')
+    if min_lon > max_lon:
+        return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, max_lon)]
+
+def radius_boxes(lat, lon, radius_m):
+    """Boxes that contain every point within `radius_m` of (lat, lon)"""
+    validate_point(lat, lon)
+    if radius_m <= 0:
+        raise ValueError('radius_m must be positive')
+    dlat = radius_m / METERS_PER_DEGREE
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle reaches a pole, so it covers every longitude
+        return [(max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0)]
+
+    # Widest longitude offset of the circle (reached north or south of its centre)
+    dlon = math.degrees(math.asin(min(1.0, math.sin(math.radians(dlat)) / math.cos(math.radians(lat)))))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return split_box(min_lat, min_lon, max_lat, max_lon)
@@ -0,0 +1,202 @@
+"""
+Upload handling, image decoding and video frame sampling
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+import cv2
+import numpy as np
+from PIL import Image
+from werkzeug.utils import secure_filename
+
+from . import metrics
+from . import thumbnails
+from .config import settings
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp'}
+VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
+ALLOWED_EXTENSIONS = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+METADATA_EXTENSIONS = IMAGE_EXTENSIONS | {'tif', 'tiff', 'heic', 'heif'}  # /api/metadata only reads the header
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def save_upload(file):
+    """Save an uploaded file under a timestamped name, hashing it as it is written; returns (filename, filepath, sha256)"""
+    filename = secure_filename(file.filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
+    filepath = os.path.join(settings['UPLOAD_FOLDER'], timestamp + filename)
+    hasher = hashlib.sha256()
+    with metrics.stage_timer('upload_save'), open(filepath, 'wb') as f:
+        for block in iter(lambda: file.stream.read(1024 * 1024), b''):
+            hasher.update(block)
+            f.write(block)
+    return filename, filepath, hasher.hexdigest()
+
+def file_sha256(filepath):
+    hasher = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def discard_upload(filepath):
+    try:
+        os.remove(filepath)
+    except OSError:
+        pass
+
+def format_size(size):
+    return f"{size / (1024*1024):.2f} MB" if size > 1024*1024 else f"{size / 1024:.2f} KB"
+
+def copy_without_metadata(image):
+    """Copy a PIL image's pixels (and palette) into a fresh image that carries no metadata"""
+    clean = Image.frombytes(image.mode, image.size, image.tobytes())
+    if image.mode == 'P':
+        clean.putpalette(image.getpalette())
+    return clean
+
+def load_image(image):
+    """Return a BGR array for a file path or an already decoded frame"""
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.imread(image)
+
+# libjpeg DCT scaling: a JPEG decoded at 1/2, 1/4 or 1/8 size costs a fraction of a full decode
+REDUCED_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+class ScaledDecoder:
+    """Decodes one image file at the lowest resolution each caller needs, once per scale.
+
+    JPEGs are decoded at the largest 1/2, 1/4 or 1/8 reduction whose longest
+    side still covers the request; other formats are decoded once at full size.
+    """
+
+    def __init__(self, filepath):
+        with Image.open(filepath) as image:  # reads the header only
+            self.size = image.size
+            reducible = image.format == 'JPEG' and settings['REDUCED_DECODE']
+        self.filepath = filepath
+        self.factors = (8, 4, 2) if reducible else ()
+        self.images = {}  # factor -> BGR array
+        self.locks = {factor: threading.Lock() for factor in REDUCED_FLAGS}
+
+    def factor_for(self, max_side):
+        longest = max(self.size)
+        return next((factor for factor in self.factors if longest / factor >= max_side), 1)
+
+    def decode(self, max_side=None):
+        """(BGR image, scale) with the longest side at least `max_side` (None: full size).
+
+        Multiply original pixel coordinates by `scale` to get decoded ones.
+        """
+        factor = self.factor_for(max_side) if max_side else 1
+        with self.locks[factor]:
+            image = self.images.get(factor)
+            if image is None:
+                with metrics.stage_timer(f"decode_1_{factor}"):
+                    image = cv2.imread(self.filepath, REDUCED_FLAGS[factor])
+                if image is None:
+                    raise ValueError(f"Could not decode {self.filepath}")
+                self.images[factor] = image
+        # cv2 applies the EXIF orientation, so compare longest sides
+        return image, max(image.shape[:2]) / float(max(self.size))
+
+def decode_image_bytes(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+def video_file_info(filepath, filename):
+    """Container-level video metadata in the analyze-video `file_info` format"""
+    cap = cv2.VideoCapture(filepath)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    file_size = os.path.getsize(filepath)
+
+    return {
+        'filename': filename,
+        'size': file_size,
+        'size_formatted': f"{file_size / (1024*1024):.2f} MB",
+        'duration': total_frames / fps if fps > 0 else 0,
+        'fps': fps,
+        'resolution': f"{width}x{height}",
+        'total_frames': total_frames
+    }
+
+def iter_video_frames(video_path, max_frames=5):
+    """Yield (frame_number, timestamp, frame) for evenly spaced frames.
+
+    Frames between samples are only grabbed, not decoded.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = max(1, total_frames // max_frames)
+
+        frame_count = 0
+        sampled = 0
+        while sampled < max_frames:
+            if frame_count % frame_interval == 0:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                sampled += 1
+                yield frame_count, frame_count / fps if fps > 0 else 0, frame
+            elif not cap.grab():
+                break
+            frame_count += 1
+    finally:
+        cap.release()
+
+def encode_frame(frame):
+    """Encode a BGR frame as a JPEG data URL"""
+    ret, buffer = cv2.imencode('.jpg', frame)
+    frame_base64 = base64.b64encode(buffer).decode('utf-8')
+    return f'data:image/jpeg;base64,{frame_base64}'
+
+def frame_image_fields(frame, delivery):
+    """Frame image as stored thumbnail URLs, or inline base64 when delivery is 'inline'"""
+    if delivery == 'inline':
+        return {'image': encode_frame(frame)}
+    urls = thumbnails.store_frame(frame)
+    return {'image': thumbnails.primary_url(urls), 'thumbnails': urls}
+
+@metrics.timed('frame_extract')
+def extract_video_frames(video_path, max_frames=5):
+    """Extract frames from video"""
+    frames_data = []
+    try:
+        for frame_number, timestamp, frame in iter_video_frames(video_path, max_frames):
+            frames_data.append({
+                'frame_number': frame_number,
+                'timestamp': timestamp,
+                'image': encode_frame(frame)
+            })
+    except Exception as e:
+        print(f"Error extracting video frames: {e}")
+
+    return frames_data
+
+@metrics.timed('image_hash')
+def get_image_hash(image_path):
+    """Calculate perceptual (average) hash of image for reverse search"""
+    try:
+        image = load_image(image_path)
+        if image is None:
+            return None
+
+        # 8x8 grayscale, one bit per pixel above the mean
+        gray = cv2.cvtColor(cv2.resize(image, (8, 8), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        avg = gray.mean()
+        return ''.join(['1' if pixel > avg else '0' for pixel in gray.flatten()])
+    except Exception as e:
+        print(f"Error generating hash: {e}")
+        return None
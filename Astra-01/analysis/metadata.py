@@ -0,0 +1,197 @@
+"""
+EXIF, GPS and camera metadata extraction
+exifread seeks to the metadata blocks and reads only those, so files are read through
+an mmap and streams through a forward-only buffer: either way only the header bytes
+exifread asks for are touched.
+"""
+
+import io
+import mmap
+import re
+
+import exifread
+
+from . import metrics
+from .config import settings
+
+class MetadataBeyondPrefix(Exception):
+    """The metadata extends past the bytes a header read may consume"""
+
+class HeaderReader:
+    """Seekable file-like view of a forward-only stream, read no further than requested.
+
+    Bytes are pulled from the stream only as far as the reader seeks or reads,
+    so parsing a header consumes roughly the header. A read starting past
+    `limit` raises MetadataBeyondPrefix, one running past it comes back short
+    (exifread over-reads its first look at a JPEG), and the end of the stream
+    reads as end of file.
+    """
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.buffer = bytearray()
+        self.position = 0
+        self.eof = False
+
+    @property
+    def bytes_read(self):
+        return len(self.buffer)
+
+    def _fill(self, end):
+        while not self.eof and len(self.buffer) < end:
+            block = self.stream.read(max(end - len(self.buffer), 64 * 1024))
+            if not block:
+                self.eof = True
+                break
+            self.buffer += block
+
+    def read(self, size=-1):
+        if size is not None and size > 0 and self.position >= self.limit:
+            raise MetadataBeyondPrefix(f"metadata extends past the first {self.limit} bytes")
+        end = self.limit if size is None or size < 0 else min(self.position + size, self.limit)
+        self._fill(end)
+        data = bytes(self.buffer[self.position:end])
+        self.position += len(data)
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            raise io.UnsupportedOperation('HeaderReader cannot seek from the end')
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+def read_exif(handle):
+    """exifread tags from a seekable binary handle, as {tag: str(value)}"""
+    exif_data = {}
+    tags = exifread.process_file(handle, details=False)
+    for tag in tags:
+        try:
+            exif_data[tag] = str(tags[tag])
+        except:
+            pass
+    return exif_data
+
+@metrics.timed('exif')
+def extract_exif_data(image_path):
+    """Extract EXIF data using exifread library, through an mmap so only the header pages are read"""
+    exif_data = {}
+    try:
+        with open(image_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            exif_data = read_exif(view)
+    except Exception as e:
+        print(f"Error reading EXIF: {e}")
+
+    return exif_data
+
+@metrics.timed('exif_header')
+def extract_exif_header(stream, limit=None):
+    """EXIF from the start of a stream without reading the rest; returns (exif_data, bytes read).
+
+    Raises MetadataBeyondPrefix when the metadata lies past `limit` bytes
+    (EXIF_HEADER_MAX_BYTES), e.g. an HEIC whose Exif item sits at the end.
+    """
+    reader = HeaderReader(stream, limit or settings['EXIF_HEADER_MAX_BYTES'])
+    return read_exif(reader), reader.bytes_read
+
+RATIO_PATTERN = re.compile(r'(-?\d+(?:\.\d+)?)(?:/(\d+(?:\.\d+)?))?')
+
+# Raw EXIF renderings kept alongside the decimal values
+GPS_RAW_TAGS = {
+    'latitude': 'GPS GPSLatitude',
+    'latitude_ref': 'GPS GPSLatitudeRef',
+    'longitude': 'GPS GPSLongitude',
+    'longitude_ref': 'GPS GPSLongitudeRef',
+    'altitude': 'GPS GPSAltitude',
+    'altitude_ref': 'GPS GPSAltitudeRef',
+}
+
+def parse_ratios(value):
+    """exifread's '[37, 46, 2999/100]' or '1234/10' rendering as floats"""
+    numbers = []
+    for numerator, denominator in RATIO_PATTERN.findall(str(value)):
+        if denominator and float(denominator) == 0:
+            return None
+        numbers.append(float(numerator) / float(denominator) if denominator else float(numerator))
+    return numbers or None
+
+def dms_to_decimal(value, ref=None):
+    """[degrees, minutes, seconds] to signed decimal degrees; S and W refs are negative"""
+    parts = parse_ratios(value)
+    if not parts:
+        return None
+    degrees = sum(part / 60 ** i for i, part in enumerate(parts[:3]))
+    if str(ref or '').strip().upper()[:1] in ('S', 'W'):
+        degrees = -degrees
+    return degrees
+
+@metrics.timed('gps_parse')
+def extract_gps_data(exif_data):
+    """Extract GPS coordinates from EXIF data as decimal degrees (altitude in metres)
+
+    The raw degree/minute/second renderings are kept under 'dms'. A fix at
+    exactly 0,0 or out of range is treated as no coordinates.
+    """
+    gps_info = {}
+    try:
+        latitude = dms_to_decimal(exif_data.get('GPS GPSLatitude'), exif_data.get('GPS GPSLatitudeRef'))
+        longitude = dms_to_decimal(exif_data.get('GPS GPSLongitude'), exif_data.get('GPS GPSLongitudeRef'))
+        if (latitude is not None and longitude is not None and -90 <= latitude <= 90 and -180 <= longitude <= 180
+                and (latitude, longitude) != (0, 0)):
+            gps_info['latitude'] = round(latitude, 7)
+            gps_info['longitude'] = round(longitude, 7)
+
+        altitude = parse_ratios(exif_data.get('GPS GPSAltitude', ''))
+        if altitude:
+            below_sea_level = str(exif_data.get('GPS GPSAltitudeRef', '')).strip() == '1'
+            gps_info['altitude'] = round(-altitude[0] if below_sea_level else altitude[0], 2)
+
+        dms = {name: exif_data[tag] for name, tag in GPS_RAW_TAGS.items() if tag in exif_data}
+        if dms:
+            gps_info['dms'] = dms
+    except Exception as e:
+        print(f"Error extracting GPS: {e}")
+
+    return gps_info if gps_info else None
+
+@metrics.timed('camera_parse')
+def extract_camera_info(exif_data):
+    """Extract camera and capture information"""
+    camera_info = {}
+    try:
+        # Camera make and model
+        if 'Image Make' in exif_data:
+            camera_info['make'] = exif_data['Image Make']
+        if 'Image Model' in exif_data:
+            camera_info['model'] = exif_data['Image Model']
+        if 'EXIF LensModel' in exif_data:
+            camera_info['lens_model'] = exif_data['EXIF LensModel']
+
+        # Capture settings
+        capture_info = {}
+        if 'EXIF ExposureTime' in exif_data:
+            capture_info['shutter_speed'] = exif_data['EXIF ExposureTime']
+        if 'EXIF FNumber' in exif_data:
+            capture_info['aperture'] = exif_data['EXIF FNumber']
+        if 'EXIF ISOSpeedRatings' in exif_data:
+            capture_info['iso'] = exif_data['EXIF ISOSpeedRatings']
+        if 'EXIF FocalLength' in exif_data:
+            capture_info['focal_length'] = exif_data['EXIF FocalLength']
+        if 'EXIF WhiteBalance' in exif_data:
+            capture_info['white_balance'] = exif_data['EXIF WhiteBalance']
+        if 'EXIF DateTimeOriginal' in exif_data:
+            capture_info['datetime'] = exif_data['EXIF DateTimeOriginal']
+        elif 'Image DateTime' in exif_data:
+            capture_info['datetime'] = exif_data['Image DateTime']
+
+        if capture_info:
+            camera_info['capture_settings'] = capture_info
+    except Exception as e:
+        print(f"Error extracting camera info: {e}")
+
+    return camera_info if camera_info else None
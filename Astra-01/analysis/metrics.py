@@ -0,0 +1,189 @@
+"""
+Prometheus-style instrumentation shared by both analysis backends
+Times pipeline stages and requests, tracks in-flight work, model loads and cache hit rates
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response
+
+from . import profiling
+
+# Seconds; covers hashing (ms) through cold model loads and long videos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+REGISTRY = []
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {_format_value(value)}')
+        return lines
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state['counts']):
+                    labels = _format_labels(key + (('le', _format_value(bound)),))
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(state["sum"])}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {state["count"]}')
+        return lines
+
+stage_seconds = Histogram('astra_stage_duration_seconds', 'Time spent in each analysis pipeline stage', ['stage'])
+stage_errors = Counter('astra_stage_errors_total', 'Pipeline stages that raised an exception', ['stage'])
+stages_in_flight = Gauge('astra_stages_in_flight', 'Pipeline stages currently running', ['stage'])
+request_seconds = Histogram('astra_request_duration_seconds', 'End-to-end request latency', ['endpoint', 'status'])
+requests_in_flight = Gauge('astra_requests_in_flight', 'Requests currently being handled', ['endpoint'])
+model_load_seconds = Histogram('astra_model_load_seconds', 'Time taken to load a model', ['model'])
+cache_requests = Counter('astra_cache_requests_total', 'Cache lookups by result', ['cache', 'result'])
+admission_rejections = Counter('astra_admission_rejections_total', 'Requests turned away with 503 by admission control', ['pool', 'reason'])
+model_unloads = Counter('astra_model_unloads_total', 'Models unloaded, by reason', ['model', 'reason'])
+model_resident_mb = Gauge('astra_model_resident_megabytes', 'Approximate resident size of each loaded model', ['model'])
+stage_gating = Counter('astra_stage_gating_total', 'Stage gating decisions', ['stage', 'decision'])
+process_rss_mb = Gauge('astra_process_resident_megabytes', 'Resident set size of the API process')
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block of work as one pipeline stage (and as a node of the active request profile)"""
+    profile = profiling.current()
+    entry = profile.enter(stage) if profile is not None else None
+    stages_in_flight.inc(stage=stage)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        stages_in_flight.dec(stage=stage)
+        if entry is not None:
+            profile.exit(entry, elapsed)
+
+def timed(stage):
+    """Decorator form of stage_timer"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _status_code(response):
+    if isinstance(response, tuple) and len(response) > 1 and isinstance(response[1], int):
+        return response[1]
+    return getattr(response, 'status_code', 200)
+
+def track_request(endpoint):
+    """Decorator for Flask views: in-flight gauge and latency by status code"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            requests_in_flight.inc(endpoint=endpoint)
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = func(*args, **kwargs)
+                status = _status_code(response)
+                return response
+            finally:
+                request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+                requests_in_flight.dec(endpoint=endpoint)
+        return wrapper
+    return decorator
+
+def record_model_load(model, seconds):
+    model_load_seconds.observe(seconds, model=model)
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache=cache, result='hit' if hit else 'miss')
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def metrics_response():
+    """Flask response in the Prometheus text exposition format"""
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,202 @@
+"""
+Model lifecycle: resident model bookkeeping, idle eviction and a process RSS budget
+Loaders report each model they load; a reaper thread unloads models idle past their
+timeout, and least recently used models go first while RSS is over budget.
+Unloaded models are reloaded by their getter on next use.
+"""
+
+import ctypes
+import gc
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from . import admission
+from . import engines
+from . import metrics
+from .config import settings
+
+_lock = threading.Lock()
+_resident = {}  # name -> record
+_events = deque(maxlen=50)
+_reaper = None
+
+try:
+    _libc = ctypes.CDLL('libc.so.6')
+except OSError:
+    _libc = None
+
+def rss_mb():
+    """Current resident set size of this process in MB (None where it can't be read)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def rss_budget_mb():
+    """The active profile's RSS budget (ASTRA_RSS_BUDGET_MB overrides it); None means no limit"""
+    return (engines.active_profile() or {}).get('rss_budget_mb')
+
+def idle_timeout(name):
+    """Idle seconds before a model is unloaded: MODEL_IDLE_TIMEOUTS by model family, else MODEL_IDLE_SECONDS"""
+    timeouts = settings['MODEL_IDLE_TIMEOUTS']
+    family = name.split(':', 1)[0]
+    return float(timeouts.get(name, timeouts.get(family, settings['MODEL_IDLE_SECONDS'])))
+
+def _record_event(name, event, reason=None, size_mb=None):
+    _events.append({
+        'time': time.time(),
+        'model': name,
+        'event': event,
+        'reason': reason,
+        'size_mb': round(size_mb, 1) if size_mb is not None else None
+    })
+    detail = ', '.join(part for part in (reason, f"{size_mb:.0f} MB" if size_mb is not None else None) if part)
+    print(f"[INFO] Model {event}: {name}" + (f" ({detail})" if detail else ''))
+
+def loaded(name, unload, size_mb=None, rss_before_mb=None):
+    """Register a freshly loaded model with the callback that drops it.
+
+    Without an explicit size, the RSS growth since `rss_before_mb` is used.
+    Loading may push the process over its RSS budget, so other idle models
+    are evicted here. A torch imported by the load gets the per-slot thread count.
+    """
+    admission.apply_torch_threads()
+    if size_mb is None and rss_before_mb is not None:
+        rss_now = rss_mb()
+        size_mb = max(0.0, rss_now - rss_before_mb) if rss_now is not None else None
+    now = time.time()
+    with _lock:
+        _resident[name] = {'unload': unload, 'size_mb': size_mb, 'loaded_at': now, 'last_used': now, 'in_use': 0}
+    metrics.model_resident_mb.set(size_mb or 0, model=name)
+    _record_event(name, 'load', size_mb=size_mb)
+    enforce_budget(keep=name)
+
+def touch(name):
+    """Mark a model as just used"""
+    with _lock:
+        record = _resident.get(name)
+        if record is not None:
+            record['last_used'] = time.time()
+
+@contextmanager
+def in_use(name):
+    """Keep a model from being evicted while a block runs inference with it"""
+    with _lock:
+        record = _resident.get(name)
+        if record is not None:
+            record['in_use'] += 1
+            record['last_used'] = time.time()
+    try:
+        yield
+    finally:
+        with _lock:
+            record = _resident.get(name)
+            if record is not None:
+                record['in_use'] = max(0, record['in_use'] - 1)
+                record['last_used'] = time.time()
+
+def unloaded(name, reason):
+    """Record a model its owner already dropped (e.g. a cache's own eviction)"""
+    with _lock:
+        record = _resident.pop(name, None)
+    if record is not None:
+        metrics.model_unloads.inc(model=name, reason=reason)
+        metrics.model_resident_mb.set(0, model=name)
+        _record_event(name, 'unload', reason, record['size_mb'])
+
+def unload(name, reason):
+    """Drop a model through its unload callback; requests already holding it finish normally"""
+    with _lock:
+        record = _resident.pop(name, None)
+    if record is None:
+        return False
+    # Called outside _lock: the callback takes its owner's lock
+    try:
+        record['unload']()
+    except Exception as e:
+        print(f"Error unloading {name}: {e}")
+    metrics.model_unloads.inc(model=name, reason=reason)
+    metrics.model_resident_mb.set(0, model=name)
+    _record_event(name, 'unload', reason, record['size_mb'])
+    _release_memory()
+    return True
+
+def _release_memory():
+    """Collect the dropped model and hand freed heap pages back to the OS"""
+    gc.collect()
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    if _libc is not None:
+        _libc.malloc_trim(0)
+
+def sweep():
+    """Unload every model idle longer than its timeout"""
+    now = time.time()
+    with _lock:
+        idle = [name for name, record in _resident.items()
+                if not record['in_use'] and now - record['last_used'] > idle_timeout(name)]
+    for name in idle:
+        unload(name, 'idle')
+
+def enforce_budget(keep=None):
+    """Unload least recently used models while RSS exceeds the RSS budget"""
+    budget = rss_budget_mb()
+    if not budget:
+        return
+    while True:
+        rss = rss_mb()
+        if rss is None or rss <= budget:
+            return
+        with _lock:
+            candidates = sorted((record['last_used'], name) for name, record in _resident.items()
+                                if name != keep and not record['in_use'])
+        if not candidates:
+            print(f"[WARNING] RSS {rss:.0f} MB exceeds budget {budget} MB with no idle model left to unload")
+            return
+        unload(candidates[0][1], 'rss_budget')
+
+def _reap():
+    while True:
+        time.sleep(settings['MODEL_SWEEP_SECONDS'])
+        try:
+            sweep()
+            enforce_budget()
+            rss = rss_mb()
+            if rss is not None:
+                metrics.process_rss_mb.set(rss)
+        except Exception as e:
+            print(f"Error in model reaper: {e}")
+
+def start_reaper():
+    """Start the background sweep once per process"""
+    global _reaper
+    with _lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap, name='model-reaper', daemon=True)
+            _reaper.start()
+
+def describe():
+    """Resident models, process RSS against its budget and recent load/unload events, for /health"""
+    now = time.time()
+    with _lock:
+        resident = [{
+            'model': name,
+            'size_mb': round(record['size_mb'], 1) if record['size_mb'] is not None else None,
+            'loaded_seconds_ago': round(now - record['loaded_at'], 1),
+            'idle_seconds': round(now - record['last_used'], 1),
+            'in_use': record['in_use'],
+            'idle_timeout_seconds': idle_timeout(name)
+        } for name, record in _resident.items()]
+    rss = rss_mb()
+    return {
+        'rss_mb': round(rss, 1) if rss is not None else None,
+        'rss_budget_mb': rss_budget_mb(),
+        'resident': resident,
+        'events': list(_events)[-20:]
+    }
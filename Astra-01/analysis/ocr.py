@@ -0,0 +1,462 @@
+"""
+Text, sign and license plate reading with EasyOCR
+Readers are cached per language set; easyocr (torch) is imported on first use
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from . import engines
+from . import metrics
+from . import models
+from . import profiling
+from .config import settings
+from .media import load_image
+from .vision import detect_objects
+
+# YOLO classes whose boxes are likely to carry text (plates, signs, vehicle livery)
+TEXT_BEARING_CLASSES = {'car', 'truck', 'bus', 'motorcycle', 'train', 'boat', 'stop sign', 'parking meter'}
+
+VEHICLE_CLASSES = {'car', 'truck', 'bus', 'motorcycle'}
+PLATE_ALLOWLIST = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+PLATE_PATTERN = re.compile(r'^(?=.*\d)[A-Z0-9]{4,10}$')
+CROP_GAP = 8  # blank rows between ROI crops stacked for one recognition pass
+
+# OCR readers keyed by language set, least recently used first
+ocr_readers = OrderedDict()  # key -> (reader, size_mb)
+ocr_reader_failures = {}  # key -> (failed_at, error)
+ocr_reader_locks = {}  # key -> lock held while that reader loads
+ocr_readers_lock = threading.Lock()
+# EasyOCR readers are not thread-safe: one call per language set at a time
+ocr_inference_locks = {}  # key -> lock held around reader calls
+
+def reader_lock(langs=None):
+    """The inference lock of the reader for a language set (bounded by OCR_ALLOWED_LANGS)"""
+    key = tuple(sorted(langs or settings['OCR_DEFAULT_LANGS']))
+    with ocr_readers_lock:
+        return ocr_inference_locks.setdefault(key, threading.Lock())
+
+def parse_ocr_langs(value):
+    """Parse a comma-separated EasyOCR language list such as 'en,ch_sim'.
+
+    Only OCR_ALLOWED_LANGS (and the default languages) are accepted, which
+    bounds the reader sets that can be loaded; raises ValueError otherwise.
+    """
+    if not value:
+        return list(settings['OCR_DEFAULT_LANGS'])
+    allowed = set(settings['OCR_ALLOWED_LANGS']) | set(settings['OCR_DEFAULT_LANGS'])
+    langs = []
+    for lang in value.split(','):
+        lang = lang.strip()
+        if lang and lang not in allowed:
+            raise ValueError(f"Unsupported OCR language {lang!r}; allowed: {', '.join(sorted(allowed))}")
+        if lang and lang not in langs:
+            langs.append(lang)
+    return langs or list(settings['OCR_DEFAULT_LANGS'])
+
+def estimate_reader_size_mb(reader):
+    """Approximate resident size of an EasyOCR reader from its model parameters"""
+    total = 0
+    for model in (getattr(reader, 'detector', None), getattr(reader, 'recognizer', None)):
+        if model is not None and hasattr(model, 'parameters'):
+            total += sum(p.numel() * p.element_size() for p in model.parameters())
+    return total / (1024 * 1024)
+
+def reader_model_name(langs=None):
+    """Lifecycle/metrics name of the reader for a language set, e.g. 'easyocr:ch_sim+en'"""
+    return f"easyocr:{'+'.join(sorted(langs or settings['OCR_DEFAULT_LANGS']))}"
+
+def unload_ocr_reader(key):
+    with ocr_readers_lock:
+        ocr_readers.pop(key, None)
+
+def get_ocr_reader(langs=None):
+    """Get an EasyOCR reader for a language set, loading it on first use.
+
+    Readers are cached per language set and evicted least-recently-used once
+    their combined size exceeds OCR_READER_CACHE_MB, or by the model
+    lifecycle manager when idle. A language set that fails to load is not
+    retried for OCR_LOAD_RETRY_SECONDS.
+    """
+    langs = langs or list(settings['OCR_DEFAULT_LANGS'])
+    key = tuple(sorted(langs))
+    name = reader_model_name(langs)
+
+    with ocr_readers_lock:
+        if key in ocr_readers:
+            ocr_readers.move_to_end(key)
+            metrics.record_cache('ocr_reader', True)
+            reader = ocr_readers[key][0]
+        else:
+            reader = None
+            key_lock = ocr_reader_locks.setdefault(key, threading.Lock())
+    if reader is not None:
+        models.touch(name)
+        return reader
+    metrics.record_cache('ocr_reader', False)
+
+    # Only one thread loads a given language set; others wait for its result
+    with key_lock:
+        with ocr_readers_lock:
+            if key in ocr_readers:
+                ocr_readers.move_to_end(key)
+                return ocr_readers[key][0]
+            failure = ocr_reader_failures.get(key)
+            if failure and time.time() - failure[0] < settings['OCR_LOAD_RETRY_SECONDS']:
+                return None
+
+        try:
+            load_start = time.perf_counter()
+            import easyocr
+            reader = easyocr.Reader(langs)
+            metrics.record_model_load(name, time.perf_counter() - load_start)
+        except Exception as e:
+            with ocr_readers_lock:
+                ocr_reader_failures[key] = (time.time(), str(e))
+            print(f"Error loading OCR model for {', '.join(langs)}: {e}")
+            return None
+
+        size_mb = estimate_reader_size_mb(reader)
+        evicted = []
+        with ocr_readers_lock:
+            ocr_reader_failures.pop(key, None)
+            ocr_readers[key] = (reader, size_mb)
+
+            # Evict least recently used readers, never the one just loaded
+            while len(ocr_readers) > 1 and sum(size for _, size in ocr_readers.values()) > settings['OCR_READER_CACHE_MB']:
+                evicted.append(ocr_readers.popitem(last=False)[0])
+
+    # Reported outside the locks: registering may unload other models
+    for evicted_key in evicted:
+        models.unloaded(reader_model_name(evicted_key), 'ocr_reader_cache')
+    models.loaded(name, lambda: unload_ocr_reader(key), size_mb=size_mb)
+    return reader
+
+def propose_text_regions(image, objects=None):
+    """Propose candidate text regions using MSER plus text-bearing YOLO boxes.
+
+    Proposals are computed on a downscaled grayscale copy and returned as
+    (x1, y1, x2, y2) boxes in original image coordinates, largest first.
+    """
+    h, w = image.shape[:2]
+    scale = min(1.0, settings['OCR_ROI_PROPOSAL_SIZE'] / float(max(h, w)))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    gh, gw = gray.shape[:2]
+    mask = np.zeros((gh, gw), dtype=np.uint8)
+
+    # Character-like stable regions
+    mser = cv2.MSER_create()
+    mser.setMinArea(20)
+    mser.setMaxArea(max(21, int(gh * gw * 0.02)))
+    _, boxes = mser.detectRegions(gray)
+    for (x, y, bw, bh) in boxes:
+        if bh < 6 or bh > gh * 0.25 or bw > bh * 8:
+            continue
+        cv2.rectangle(mask, (int(x), int(y)), (int(x + bw), int(y + bh)), 255, -1)
+
+    # Merge characters into words and lines
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 5))
+    mask = cv2.dilate(mask, kernel, iterations=1)
+
+    # Vehicles and signs are worth reading even when MSER misses them
+    for obj in objects or []:
+        if obj['class'] in TEXT_BEARING_CLASSES:
+            x1, y1, x2, y2 = [int(v * scale) for v in obj['bbox']]
+            cv2.rectangle(mask, (x1, y1), (x2, y2), 255, -1)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    regions = []
+    for contour in contours:
+        x, y, bw, bh = cv2.boundingRect(contour)
+        if bw < 10 or bh < 8:
+            continue
+        pad = 4
+        regions.append((
+            max(0, int((x - pad) / scale)),
+            max(0, int((y - pad) / scale)),
+            min(w, int((x + bw + pad) / scale)),
+            min(h, int((y + bh + pad) / scale))
+        ))
+
+    regions.sort(key=lambda r: (r[2] - r[0]) * (r[3] - r[1]), reverse=True)
+    return regions[:settings['OCR_ROI_MAX_REGIONS']]
+
+def read_text_regions(reader, lock, images, batch_size=None, workers=None):
+    """Run OCR on candidate regions of several images, mapping results back to each image.
+
+    `images` is [(image, regions)]. Text lines are localized per crop, then the
+    grayscale crops of all images are stacked on one canvas so that every line
+    is recognized in a single batched call. Reader calls hold `lock`, the
+    reader's inference lock. Returns one result list per image.
+    """
+    crops = []  # (top on the canvas, image index, x1, y1, grayscale crop)
+    horizontal_list = []
+    free_list = []
+    top = 0
+    for index, (image, regions) in enumerate(images):
+        for (x1, y1, x2, y2) in regions:
+            crop = image[y1:y2, x1:x2]
+            if crop.size == 0:
+                continue
+            with profiling.section('ocr_detect'), lock:
+                crop_horizontal, crop_free = reader.detect(crop)
+            if not crop_horizontal[0] and not crop_free[0]:
+                continue
+            # Line boxes stay inside their crop, so they never reach a neighbour on the canvas
+            ch, cw = crop.shape[:2]
+            for (x_min, x_max, y_min, y_max) in crop_horizontal[0]:
+                horizontal_list.append([max(0, x_min), min(cw, x_max), max(0, y_min) + top, min(ch, y_max) + top])
+            for polygon in crop_free[0]:
+                free_list.append([[min(max(0, point[0]), cw), min(max(0, point[1]), ch) + top] for point in polygon])
+            crops.append((top, index, x1, y1, cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)))
+            top += ch + CROP_GAP
+
+    results = [[] for _ in images]
+    if not crops:
+        return results
+
+    canvas = np.zeros((top, max(gray.shape[1] for *_, gray in crops)), dtype=np.uint8)
+    for crop_top, _, _, _, gray in crops:
+        canvas[crop_top:crop_top + gray.shape[0], :gray.shape[1]] = gray
+    with profiling.section('ocr_recognize'), lock:
+        recognized = reader.recognize(canvas, horizontal_list=horizontal_list, free_list=free_list,
+                                      batch_size=batch_size or settings['OCR_BATCH_SIZE'],
+                                      workers=settings['OCR_WORKERS'] if workers is None else workers)
+
+    tops = [crop[0] for crop in crops]
+    for (bbox, text, confidence) in recognized:
+        center_y = sum(point[1] for point in bbox) / len(bbox)
+        crop_top, index, x1, y1, _ = crops[max(0, bisect_right(tops, center_y) - 1)]
+        results[index].append(([[point[0] + x1, point[1] - crop_top + y1] for point in bbox], text, confidence))
+    return results
+
+def categorize_text_results(results, text_detections, classify_plates=True):
+    """Sort raw OCR results into signboards, shop names, street signs, plates and general text"""
+    for (bbox, text, confidence) in results:
+        if confidence > 0.5:  # Filter low confidence detections
+            text = text.strip()
+            if not text:
+                continue
+            text_info = {
+                'text': text,
+                'confidence': float(confidence),
+                'bbox': [[int(point[0]), int(point[1])] for point in bbox]
+            }
+
+            # Categorize text based on patterns
+            text_upper = text.upper()
+
+            # License plate patterns (alphanumeric, specific formats)
+            if classify_plates and any(char.isdigit() for char in text) and any(char.isalpha() for char in text):
+                if len(text) <= 10 and len(text) >= 5:
+                    text_detections['license_plates'].append(text_info)
+
+            # Street signs (common words)
+            street_keywords = ['STREET', 'AVE', 'AVENUE', 'RD', 'ROAD', 'BLVD', 'BOULEVARD', 'DR', 'DRIVE', 'LN', 'LANE', 'CT', 'COURT', 'PL', 'PLACE', 'SQ', 'SQUARE']
+            if any(keyword in text_upper for keyword in street_keywords):
+                text_detections['street_signs'].append(text_info)
+
+            # Shop names (common business indicators)
+            shop_keywords = ['STORE', 'SHOP', 'MART', 'MARKET', 'CAFE', 'RESTAURANT', 'HOTEL', 'MOTEL', 'GAS', 'STATION', 'PHARMACY', 'BANK', 'ATM']
+            if any(keyword in text_upper for keyword in shop_keywords) or (len(text) <= 30 and text[0].isupper()):
+                text_detections['shop_names'].append(text_info)
+
+            # Signboards (general text with high confidence)
+            if confidence > 0.8 and len(text) <= 50:
+                text_detections['signboards'].append(text_info)
+
+            # General text
+            text_detections['general_text'].append(text_info)
+
+    return text_detections
+
+def empty_text_detections():
+    return {
+        'signboards': [],
+        'shop_names': [],
+        'street_signs': [],
+        'license_plates': [],
+        'general_text': []
+    }
+
+def detect_text_and_signs(image_path, mode=None, objects=None, langs=None):
+    """Detect text, signboards, shop names, street signs, and license plates using OCR
+
+    In 'roi' mode only MSER text proposals and text-bearing YOLO boxes (pass
+    `objects` to reuse an existing detection pass) are recognized; when the
+    proposals cover most of the frame it falls back to full-frame OCR.
+    """
+    return detect_text_and_signs_batch([image_path], mode=mode, objects_list=[objects], langs=langs)[0]
+
+@metrics.timed('ocr')
+def detect_text_and_signs_batch(images, mode=None, objects_list=None, batch_size=None, workers=None, langs=None,
+                                regions_list=None):
+    """Run OCR over several images (file paths or BGR arrays) in batched passes.
+
+    Images that go through full-frame OCR are grouped by size and sent to
+    EasyOCR's readtext_batched, OCR_FRAME_BATCH at a time. ROI-mode images
+    have text lines located per region, reusing `regions_list` entries already
+    proposed (e.g. by gating), and the lines of OCR_FRAME_BATCH images are
+    recognized in one pass. Returns one `text_detections` dict per image, in
+    input order. `langs` selects the OCR reader (defaults to OCR_LANGS).
+    """
+    mode = mode or settings['OCR_MODE']
+    batch_size = batch_size or settings['OCR_BATCH_SIZE']
+    workers = settings['OCR_WORKERS'] if workers is None else workers
+    objects_list = objects_list or [None] * len(images)
+    regions_list = regions_list or [None] * len(images)
+    all_detections = [empty_text_detections() for _ in images]
+    classify_plates = settings['PLATE_DETECTION'] == 'ocr'
+
+    try:
+        reader = get_ocr_reader(langs)
+        if reader is None:
+            return all_detections
+        lock = reader_lock(langs)
+
+        # Held resident until every image is read
+        with models.in_use(reader_model_name(langs)):
+            decoded = [load_image(image) for image in images]
+
+            # Images needing full-frame OCR, grouped by shape for batching, and ROI-mode images
+            full_frame = {}
+            roi_images = []  # (index, regions)
+            for i, image in enumerate(decoded):
+                if image is None:
+                    continue
+                if mode == 'roi':
+                    regions = regions_list[i]
+                    if regions is None:
+                        regions = propose_text_regions(image, objects_list[i])
+                    covered = sum((x2 - x1) * (y2 - y1) for (x1, y1, x2, y2) in regions)
+                    if covered <= settings['OCR_ROI_MAX_COVERAGE'] * image.shape[0] * image.shape[1]:
+                        roi_images.append((i, regions))
+                        continue
+                full_frame.setdefault(image.shape, []).append(i)
+
+            frame_batch = max(1, settings['OCR_FRAME_BATCH'])
+            for start in range(0, len(roi_images), frame_batch):
+                window = roi_images[start:start + frame_batch]
+                window_results = read_text_regions(reader, lock, [(decoded[i], regions) for i, regions in window],
+                                                   batch_size, workers)
+                for (i, _), results in zip(window, window_results):
+                    categorize_text_results(results, all_detections[i], classify_plates)
+
+            for indices in full_frame.values():
+                for start in range(0, len(indices), frame_batch):
+                    chunk = indices[start:start + frame_batch]
+                    with profiling.section('ocr_readtext_batched'), lock:
+                        batch_results = reader.readtext_batched([decoded[i] for i in chunk],
+                                                                batch_size=batch_size, workers=workers)
+                    for i, results in zip(chunk, batch_results):
+                        categorize_text_results(results, all_detections[i], classify_plates)
+
+    except Exception as e:
+        print(f"Error in text detection: {e}")
+
+    return all_detections
+
+def locate_plate_candidates(vehicle_crop, max_candidates=3):
+    """Find plate-shaped rectangles inside a vehicle crop with a contour heuristic.
+
+    Returns (x1, y1, x2, y2) boxes in crop coordinates.
+    """
+    h, w = vehicle_crop.shape[:2]
+    gray = cv2.cvtColor(vehicle_crop, cv2.COLOR_BGR2GRAY)
+    gray = cv2.bilateralFilter(gray, 11, 17, 17)
+    edges = cv2.Canny(gray, 30, 200)
+    contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+
+    candidates = []
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:30]:
+        x, y, bw, bh = cv2.boundingRect(contour)
+        if bh == 0:
+            continue
+        aspect = bw / float(bh)
+        area_fraction = (bw * bh) / float(w * h)
+        if not (1.5 <= aspect <= 6.0 and 0.003 <= area_fraction <= 0.2):
+            continue
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if not (4 <= len(approx) <= 8):
+            continue
+        # Skip boxes mostly inside one already kept
+        if any(x >= cx1 - 2 and y >= cy1 - 2 and x + bw <= cx2 + 2 and y + bh <= cy2 + 2 for (cx1, cy1, cx2, cy2) in candidates):
+            continue
+        candidates.append((x, y, x + bw, y + bh))
+        if len(candidates) >= max_candidates:
+            break
+
+    return candidates
+
+@metrics.timed('license_plates')
+def detect_license_plates(image_path, objects=None, langs=None):
+    """Localize license plates inside YOLO vehicle boxes and OCR only those crops.
+
+    Returns plate entries in the `text_detections['license_plates']` format,
+    with the vehicle class that carries each plate. Frames without vehicles
+    never reach the OCR reader.
+    """
+    plates = []
+    try:
+        image = load_image(image_path)
+        if image is None:
+            return plates
+
+        if objects is None:
+            objects = detect_objects(image)
+        vehicles = [obj for obj in objects if obj['class'] in VEHICLE_CLASSES and obj['confidence'] > 0.3]
+        if not vehicles:
+            return plates
+
+        h, w = image.shape[:2]
+        boxes = []
+        box_vehicles = {}
+        for vehicle in vehicles:
+            x1, y1, x2, y2 = [int(v) for v in vehicle['bbox']]
+            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+            crop = image[y1:y2, x1:x2]
+            if crop.size == 0:
+                continue
+            for (px1, py1, px2, py2) in locate_plate_candidates(crop):
+                box = [px1 + x1, px2 + x1, py1 + y1, py2 + y1]
+                boxes.append(box)
+                box_vehicles[(box[0], box[2])] = vehicle['class']
+
+        if not boxes:
+            return plates
+
+        reader = get_ocr_reader(langs)
+        if reader is None:
+            return plates
+
+        # Recognition only: plate boxes are already localized
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        with models.in_use(reader_model_name(langs)), profiling.section('ocr_recognize'), reader_lock(langs):
+            results = reader.recognize(gray, horizontal_list=boxes, free_list=[],
+                                       allowlist=PLATE_ALLOWLIST, batch_size=settings['OCR_BATCH_SIZE'])
+
+        for (bbox, text, confidence) in results:
+            plate_text = re.sub(r'[^A-Z0-9]', '', text.upper())
+            if confidence > 0.3 and PLATE_PATTERN.match(plate_text):
+                plates.append({
+                    'text': plate_text,
+                    'confidence': float(confidence),
+                    'bbox': [[int(point[0]), int(point[1])] for point in bbox],
+                    'vehicle': box_vehicles.get((int(bbox[0][0]), int(bbox[0][1])))
+                })
+
+    except Exception as e:
+        print(f"Error in license plate detection: {e}")
+
+    return plates
+
+engines.register_engine('ocr', 'easyocr', detect_text_and_signs_batch, memory_mb=900, cpu_cost=8, load=get_ocr_reader)
+engines.register_engine('plates', 'contour_easyocr', detect_license_plates, memory_mb=0, cpu_cost=1, requires=['ocr'])
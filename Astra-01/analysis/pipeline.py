@@ -0,0 +1,407 @@
+"""
+Stage planning and execution for image and video analysis
+Stages run only when the active profile selected an engine for them
+"""
+
+import copy
+import os
+from datetime import datetime
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from . import engines
+from . import gating
+from . import metrics
+from . import scheduler
+from .config import settings
+from .media import ScaledDecoder, file_sha256, format_size, get_image_hash
+from .metadata import extract_camera_info, extract_exif_data, extract_gps_data
+from .ocr import empty_text_detections
+from .risk import assess_image_risk
+from .vision import (LANDMARK_STAGES, detect_landmarks, detect_objects, merge_landmarks, reverse_image_search,
+                     run_landmark_stage)
+
+# Stages of /api/analyze-image and the stages whose output they need
+IMAGE_STAGE_DEPENDENCIES = {
+    'exif': [],
+    'gps': ['exif'],
+    'camera': ['exif'],
+    'objects': [],
+    'landmarks': [],
+    'reverse_search': [],
+    'hash': [],
+}
+
+# Image stages backed by engines; a stage is available if any of its engines is selected
+IMAGE_STAGE_ENGINES = {
+    'objects': ['objects'],
+    'landmarks': ['face', 'hands', 'pose'],
+}
+
+def stage_available(stage):
+    if stage not in IMAGE_STAGE_ENGINES:
+        return True
+    return any(engines.enabled(engine_stage) for engine_stage in IMAGE_STAGE_ENGINES[stage])
+
+def plan_image_stages(requested=None):
+    """Resolve requested stage names (comma-separated or list) plus their dependencies.
+
+    Returns (stages in execution order, requested stages the active profile
+    cannot run); raises ValueError for unknown names.
+    """
+    if not requested:
+        requested = list(IMAGE_STAGE_DEPENDENCIES)
+    elif isinstance(requested, str):
+        requested = [stage.strip() for stage in requested.split(',') if stage.strip()]
+
+    unknown = [stage for stage in requested if stage not in IMAGE_STAGE_DEPENDENCIES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(IMAGE_STAGE_DEPENDENCIES)}")
+
+    plan = []
+    unavailable = []
+    def visit(stage):
+        if not stage_available(stage):
+            if stage not in unavailable:
+                unavailable.append(stage)
+            return
+        for dependency in IMAGE_STAGE_DEPENDENCIES[stage]:
+            visit(dependency)
+        if stage not in plan:
+            plan.append(stage)
+
+    # Keep the canonical order so output is stable regardless of request order
+    for stage in IMAGE_STAGE_DEPENDENCIES:
+        if stage in requested:
+            visit(stage)
+    return plan, unavailable
+
+def gateable_stages():
+    """Model stages the active profile would run, i.e. those gating can skip"""
+    stages = [stage for stage in LANDMARK_STAGES + ['ocr'] if engines.enabled(stage)]
+    if engines.enabled('plates') and settings['PLATE_DETECTION'] == 'stage':
+        stages.append('plates')
+    return stages
+
+HASH_DECODE_SIDE = 64  # the average hash reduces to 8x8
+
+def scale_boxes(objects, scale):
+    """Objects with their boxes multiplied by `scale`, e.g. 1 / decode scale for original pixels"""
+    if objects is None or scale == 1:
+        return objects
+    return [{**obj, 'bbox': [value * scale for value in obj['bbox']]} for obj in objects]
+
+def detect_objects_scaled(decoder):
+    """Objects on a decode just large enough for the detector, with boxes in original pixels"""
+    image, scale = decoder.decode(settings['YOLO_IMGSZ'])
+    return scale_boxes(detect_objects(image), 1 / scale)
+
+def landmark_rgb(decoder):
+    """RGB for MediaPipe; its outputs are counts, so no coordinates need rescaling"""
+    image, _ = decoder.decode(settings['LANDMARK_DECODE_SIDE'])
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+def evaluate_gating(decoder, gating_rules, stages, objects):
+    """Gating decisions on the text-proposal resolution, with the object boxes scaled to match"""
+    image, scale = decoder.decode(settings['OCR_ROI_PROPOSAL_SIZE'])
+    return gating.evaluate(gating_rules, stages, image, scale_boxes(objects, scale))[0]
+
+def image_stage_graph(filepath, plan, gating_rules=None):
+    """Stage graph for the planned image stages.
+
+    'image' is a per-request ScaledDecoder: each pixel stage decodes at the
+    resolution it needs (JPEGs at 1/2 to 1/8 scale when that suffices) and
+    shares each scale. Face, hands and pose are separate stages merged into
+    'landmarks'; those with a gating rule wait for the 'gating' decisions,
+    which wait for object detection when it is planned.
+    """
+    graph = [
+        scheduler.stage('exif', lambda results: extract_exif_data(filepath)),
+        scheduler.stage('gps', lambda results: extract_gps_data(results['exif']), needs=['exif']),
+        scheduler.stage('camera', lambda results: extract_camera_info(results['exif']), needs=['exif']),
+        scheduler.stage('objects', lambda results: detect_objects_scaled(results['image']), needs=['image']),
+        scheduler.stage('reverse_search', lambda results: reverse_image_search(filepath)),
+        scheduler.stage('hash', lambda results: get_image_hash(results['image'].decode(HASH_DECODE_SIDE)[0]),
+                        needs=['image']),
+    ]
+    graph = [spec for spec in graph if spec['name'] in plan]
+    if any(stage in plan for stage in ('objects', 'landmarks', 'hash')):
+        graph.append(scheduler.stage('image', lambda results: ScaledDecoder(filepath)))
+
+    if 'landmarks' in plan:
+        landmark_stages = [stage for stage in LANDMARK_STAGES if engines.enabled(stage)]
+        gated = [stage for stage in landmark_stages if stage in (gating_rules or {})]
+        graph.append(scheduler.stage('rgb', lambda results: landmark_rgb(results['image']), needs=['image']))
+        if gated:
+            graph.append(scheduler.stage(
+                'gating',
+                lambda results: evaluate_gating(results['image'], gating_rules, gated, results.get('objects')),
+                needs=['image'], after=['objects'] if 'objects' in plan else []))
+
+        def landmark_runner(stage):
+            def run(results):
+                if stage in gating.skipped(results.get('gating', {})):
+                    return None
+                return run_landmark_stage(stage, results['rgb'])
+            return run
+
+        for stage in landmark_stages:
+            graph.append(scheduler.stage(stage, landmark_runner(stage),
+                                         needs=['rgb', 'gating'] if stage in gated else ['rgb']))
+        graph.append(scheduler.stage('landmarks',
+                                     lambda results: merge_landmarks({stage: results.get(stage) for stage in landmark_stages}),
+                                     after=landmark_stages))
+    return graph
+
+def run_image_stages(filepath, plan, gating_rules=None):
+    """Run the planned stages as a concurrent stage graph; returns (results, stage report)
+
+    Independent stages (EXIF, hashing, YOLO, each MediaPipe pass) overlap, so
+    latency approaches the slowest chain rather than the sum. Results hold the
+    planned stages plus the 'gating' decisions; stages that failed or timed
+    out are left out.
+    """
+    outputs, report = scheduler.run_graph(image_stage_graph(filepath, plan, gating_rules))
+    results = {stage: outputs[stage] for stage in plan if stage in outputs}
+    if 'gating' in outputs:
+        results['gating'] = outputs['gating']
+    return results, report
+
+def analyze_image_file(filepath, filename, plan, unavailable=(), gating_rules=None, sha256=None):
+    """The /api/analyze-image result (without 'status') for an image on disk.
+
+    Pass `sha256` when the caller already has it (uploads hash while saving,
+    scans before analyzing); otherwise the file is read once more to hash it.
+    """
+    with Image.open(filepath) as image:
+        img_width, img_height = image.size
+        img_format = image.format
+    file_size = os.path.getsize(filepath)
+    sha256 = sha256 or file_sha256(filepath)
+
+    # EXIF, detection, reverse search and hashing as planned, independent stages concurrently
+    stage_results, stage_report = run_image_stages(filepath, plan, gating_rules)
+
+    return {
+        'file_info': {
+            'filename': filename,
+            'size': file_size,
+            'size_formatted': format_size(file_size),
+            'width': img_width,
+            'height': img_height,
+            'aspect_ratio': f"{img_width / img_height:.2f}" if img_height else "Unknown",
+            'format': img_format,
+            'creation_time': datetime.now().isoformat(),
+            'sha256': sha256
+        },
+        'stages_run': plan,
+        'stages_unavailable': list(unavailable),
+        'stage_report': stage_report,
+        'exif_data': stage_results.get('exif'),
+        'gps_data': stage_results.get('gps'),
+        'camera_info': stage_results.get('camera'),
+        # Detection fields keep their empty shape when a stage is not run or times out;
+        # stage_report says which
+        'objects_detected': stage_results.get('objects', []),
+        'landmarks_detected': stage_results.get('landmarks') or merge_landmarks({}),
+        'reverse_search': stage_results.get('reverse_search'),
+        'image_hash': stage_results.get('hash'),
+        'gating': stage_results.get('gating', {}),
+        'privacy_risk': assess_image_risk(stage_results)
+    }
+
+def analyze_frames(frame_images, ocr_options):
+    """Objects, landmarks, text and location clues for a list of decoded frames
+
+    `ocr_options['gating']` rules skip landmark, OCR and plate stages on frames
+    without the signal they need; each frame records the decisions under 'gating'.
+    """
+    # Detect objects first: they drive the gating decisions
+    frame_objects = [detect_objects(frame_image) for frame_image in frame_images]
+    rules = ocr_options.get('gating') or {}
+    stages = gateable_stages()
+    # Without an object engine there is no person/vehicle signal, so those rules don't apply
+    objects_detected = engines.enabled('objects')
+    frame_gates = [gating.evaluate(rules, stages, frame_image, objects if objects_detected else None)
+                   for frame_image, objects in zip(frame_images, frame_objects)]
+    frame_skipped = [gating.skipped(decisions) for decisions, _ in frame_gates]
+
+    frame_landmarks = [detect_landmarks(frame_image, gated=skipped)
+                       for frame_image, skipped in zip(frame_images, frame_skipped)]
+
+    # Detect text and signs across the frames that passed gating, in batched OCR passes
+    frame_texts = [empty_text_detections() for _ in frame_images]
+    if engines.enabled('ocr'):
+        ocr_indices = [i for i, skipped in enumerate(frame_skipped) if 'ocr' not in skipped]
+        if ocr_indices:
+            texts = engines.run(
+                'ocr',
+                [frame_images[i] for i in ocr_indices],
+                mode=ocr_options['mode'],
+                objects_list=[frame_objects[i] for i in ocr_indices],
+                batch_size=ocr_options['batch_size'],
+                workers=ocr_options['workers'],
+                langs=ocr_options['langs'],
+                regions_list=[frame_gates[i][1].get('text_regions') for i in ocr_indices]
+            )
+            for i, text_detections in zip(ocr_indices, texts):
+                frame_texts[i] = text_detections
+
+    # License plates come from the dedicated plate stage
+    if engines.enabled('plates') and settings['PLATE_DETECTION'] == 'stage':
+        for i, frame_image in enumerate(frame_images):
+            if 'plates' not in frame_skipped[i]:
+                frame_texts[i]['license_plates'] = engines.run('plates', frame_image, objects=frame_objects[i],
+                                                               langs=ocr_options['langs'])
+
+    analyses = []
+    for i, frame_image in enumerate(frame_images):
+        analyses.append({
+            'objects': frame_objects[i],
+            'landmarks': frame_landmarks[i],
+            'text_detections': frame_texts[i],
+            # Location clues reuse this frame's detections
+            'location_clues': detect_location_clues(frame_image, objects=frame_objects[i], text_detections=frame_texts[i]),
+            'gating': frame_gates[i][0]
+        })
+    return analyses
+
+class FrameDedup:
+    """Downscaled grayscale signatures of analyzed frames, for reusing their results.
+
+    A frame whose mean absolute difference from an analyzed frame's signature is
+    within `threshold` (a fraction of full scale; 0 disables) is a near-duplicate.
+    """
+
+    SIGNATURE_SIZE = (32, 32)
+
+    def __init__(self, threshold=None):
+        self.threshold = settings['VIDEO_DEDUP_THRESHOLD'] if threshold is None else threshold
+        self._seen = []  # (signature, frame_number, analysis)
+
+    @staticmethod
+    def signature(frame):
+        small = cv2.resize(frame, FrameDedup.SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+
+    def match(self, signature):
+        """(frame_number, analysis, difference) of the closest analyzed frame within the threshold, else None"""
+        best = None
+        for seen_signature, frame_number, analysis in self._seen:
+            difference = float(np.mean(np.abs(signature - seen_signature)))
+            if difference <= self.threshold and (best is None or difference < best[2]):
+                best = (frame_number, analysis, difference)
+        return best
+
+    def add(self, signature, frame_number, analysis):
+        self._seen.append((signature, frame_number, analysis))
+
+def analyze_sampled_frames(sampled, ocr_options, dedup=None):
+    """analyze_frames over (frame_number, timestamp, frame) samples, skipping near-duplicates.
+
+    A near-duplicate of a frame already analyzed through `dedup` (or earlier
+    in `sampled`) gets a copy of that frame's results, marked with
+    `reused_from` and `frame_difference`, and costs no inference. Pass the same
+    FrameDedup across calls to deduplicate a stream frame by frame.
+    """
+    dedup = dedup or FrameDedup()
+    signatures = []
+    unique = []  # indexes into sampled that need inference
+    for i, (_, _, frame) in enumerate(sampled):
+        signature = FrameDedup.signature(frame) if dedup.threshold > 0 else None
+        signatures.append(signature)
+        if signature is None:
+            unique.append(i)
+            continue
+        # Earlier unique frames of this batch only reach dedup once analyzed
+        batch_match = min(((float(np.mean(np.abs(signature - signatures[j]))), j) for j in unique), default=None)
+        if dedup.match(signature) is None and (batch_match is None or batch_match[0] > dedup.threshold):
+            unique.append(i)
+
+    analyses = dict(zip(unique, analyze_frames([sampled[i][2] for i in unique], ocr_options)))
+    results = []
+    for i, (frame_number, timestamp, _) in enumerate(sampled):
+        if i in analyses:
+            analysis = {'frame_number': frame_number, 'timestamp': timestamp, **analyses[i]}
+            if signatures[i] is not None:
+                dedup.add(signatures[i], frame_number, analysis)
+            metrics.record_cache('frame_dedup', False)
+        else:
+            source_number, source, difference = dedup.match(signatures[i])
+            analysis = copy.deepcopy({key: value for key, value in source.items()
+                                      if key not in ('frame_number', 'timestamp', 'reused_from', 'frame_difference')})
+            analysis = {'frame_number': frame_number, 'timestamp': timestamp, **analysis,
+                        'reused_from': source_number, 'frame_difference': round(difference, 4)}
+            metrics.record_cache('frame_dedup', True)
+        results.append(analysis)
+    return results
+
+@metrics.timed('location_clues')
+def detect_location_clues(image_path, objects=None, text_detections=None):
+    """Detect recognizable landmarks and location clues
+
+    Pass `objects` and `text_detections` from earlier stages to avoid running
+    YOLO and OCR a second time on the same image.
+    """
+    location_clues = {
+        'landmarks': [],
+        'buildings': [],
+        'transportation': [],
+        'nature': [],
+        'infrastructure': []
+    }
+
+    try:
+        # Use YOLO object detection for location clues
+        if objects is None:
+            objects = detect_objects(image_path)
+
+        # Location-relevant YOLO classes
+        location_classes = {
+            'landmarks': ['traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench'],
+            'buildings': ['building', 'house', 'apartment', 'hotel', 'museum'],
+            'transportation': ['car', 'truck', 'bus', 'motorcycle', 'bicycle', 'train', 'boat'],
+            'nature': ['tree', 'potted plant', 'flower', 'mountain', 'beach'],
+            'infrastructure': ['bridge', 'tunnel', 'road', 'sidewalk', 'street']
+        }
+
+        for obj in objects:
+            class_name = obj['class']
+            confidence = obj['confidence']
+
+            if confidence > 0.3:  # Lower threshold for location clues
+                clue_info = {
+                    'object': class_name,
+                    'confidence': confidence,
+                    'bbox': obj['bbox']
+                }
+
+                # Categorize based on class
+                for category, classes in location_classes.items():
+                    if class_name.lower() in classes:
+                        location_clues[category].append(clue_info)
+                        break
+
+        # Detect text-based location clues
+        if text_detections is None:
+            text_detections = engines.run('ocr', [image_path], objects_list=[objects])[0] if engines.enabled('ocr') else empty_text_detections()
+        if text_detections['street_signs']:
+            location_clues['landmarks'].extend([{
+                'object': f"Street Sign: {sign['text']}",
+                'confidence': sign['confidence'],
+                'bbox': sign['bbox']
+            } for sign in text_detections['street_signs']])
+
+        if text_detections['shop_names']:
+            location_clues['buildings'].extend([{
+                'object': f"Shop: {shop['text']}",
+                'confidence': shop['confidence'],
+                'bbox': shop['bbox']
+            } for shop in text_detections['shop_names']])
+
+    except Exception as e:
+        print(f"Error in location clue detection: {e}")
+
+    return location_clues
@@ -0,0 +1,188 @@
+"""
+On-demand request profiling for the analysis endpoints
+Builds a per-request timing tree from the metrics stage timers, with I/O, memory and optional cProfile data
+"""
+
+import contextvars
+import cProfile
+import hmac
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_active_profile = contextvars.ContextVar('astra_active_profile', default=None)
+_current_node = contextvars.ContextVar('astra_profile_node', default=None)
+
+CPROFILE_TOP_N = 25
+
+# One cProfile run at a time: concurrent profilers raise on Python 3.12+
+_cprofile_lock = threading.Lock()
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _io_read_bytes():
+    """Bytes read by this process so far (Linux only)"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+class RequestProfile:
+    """Timing tree for one request; stages nest by the context they run in"""
+
+    def __init__(self, name, use_cprofile=False, request_bytes=0):
+        self.root = {'name': name, 'duration_ms': None, 'children': []}
+        self.request_bytes = request_bytes
+        self.use_cprofile = use_cprofile
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._start = None
+        self._rss_start = None
+        self._io_start = None
+
+    def enter(self, name):
+        parent = _current_node.get() or self.root
+        node = {'name': name, 'duration_ms': None, 'children': []}
+        with self._lock:
+            parent['children'].append(node)
+        return node, _current_node.set(node)
+
+    def exit(self, entry, seconds):
+        node, token = entry
+        node['duration_ms'] = round(seconds * 1000, 3)
+        _current_node.reset(token)
+
+    @contextmanager
+    def activate(self):
+        profile_token = _active_profile.set(self)
+        node_token = _current_node.set(self.root)
+        self._rss_start = _peak_rss_kb()
+        self._io_start = _io_read_bytes()
+        if self.use_cprofile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.root['duration_ms'] = round((time.perf_counter() - self._start) * 1000, 3)
+            if self._profiler is not None:
+                self._profiler.disable()
+            _current_node.reset(node_token)
+            _active_profile.reset(profile_token)
+
+    def report(self):
+        rss_end = _peak_rss_kb()
+        io_end = _io_read_bytes()
+        report = {
+            'timings': self.root,
+            'request_bytes': self.request_bytes,
+            'io_read_bytes': io_end - self._io_start if io_end is not None and self._io_start is not None else None,
+            'peak_rss_delta_kb': rss_end - self._rss_start if rss_end is not None and self._rss_start is not None else None
+        }
+        if self._profiler is not None:
+            report['cprofile'] = self._cprofile_entries()
+            report['cprofile_scope'] = 'request_thread'
+        return report
+
+    def _cprofile_entries(self):
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        entries = []
+        for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+            entries.append({
+                'function': f'{filename}:{line}({func})',
+                'calls': nc,
+                'total_ms': round(tt * 1000, 3),
+                'cumulative_ms': round(ct * 1000, 3)
+            })
+        entries.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+        return entries[:CPROFILE_TOP_N]
+
+def current():
+    """The profile of the request running in this context, if any"""
+    return _active_profile.get()
+
+@contextmanager
+def section(name):
+    """Record a sub-step (e.g. inference vs. pre/post-processing) in the active profile only"""
+    profile = current()
+    if profile is None:
+        yield
+        return
+    entry = profile.enter(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.exit(entry, time.perf_counter() - start)
+
+def annotate(**fields):
+    """Attach extra fields (e.g. model-reported speeds) to the current profile node"""
+    if current() is None:
+        return
+    node = _current_node.get()
+    if node is not None:
+        node.update(fields)
+
+def _authorized():
+    token = current_app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(token, supplied)
+
+def _attach(response, report):
+    status = None
+    if isinstance(response, tuple):
+        response, status = response[0], response[1]
+    if getattr(response, 'is_streamed', False):
+        return response if status is None else (response, status)
+    data = response.get_json(silent=True) if hasattr(response, 'get_json') else None
+    if not isinstance(data, dict):
+        return response if status is None else (response, status)
+    data['profile'] = report
+    return jsonify(data), status or response.status_code
+
+def profile_request(func):
+    """Decorator for Flask views: `?profile=1` (or `?profile=cprofile`) attaches a timing tree.
+
+    Requires the X-Admin-Token header to match the ADMIN_TOKEN config.
+    cProfile only sees the request thread, not stage-graph or worker threads
+    (their time shows in the timing tree), and only one cProfile request runs
+    at a time; others get a 409.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        mode = request.args.get('profile')
+        if not mode or mode == '0':
+            return func(*args, **kwargs)
+        if not _authorized():
+            return jsonify({'error': 'Profiling requires a valid admin token'}), 403
+
+        use_cprofile = mode == 'cprofile'
+        if use_cprofile and not _cprofile_lock.acquire(blocking=False):
+            return jsonify({'error': 'Another cProfile request is running; retry later'}), 409
+        try:
+            profile = RequestProfile(request.endpoint, use_cprofile=use_cprofile, request_bytes=request.content_length or 0)
+            with profile.activate():
+                response = func(*args, **kwargs)
+            return _attach(response, profile.report())
+        finally:
+            if use_cprofile:
+                _cprofile_lock.release()
+    return wrapper
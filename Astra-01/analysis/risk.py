@@ -0,0 +1,107 @@
+"""
+Privacy risk scoring for image and video analysis results
+"""
+
+def assess_image_risk(stage_results):
+    """Score privacy risk from whichever stages ran; missing inputs contribute nothing"""
+    gps_data = stage_results.get('gps')
+    camera_info = stage_results.get('camera')
+    objects = stage_results.get('objects') or []
+    landmarks = stage_results.get('landmarks')
+
+    factors = {
+        'gps_location': bool(gps_data),
+        'camera_info': bool(camera_info),
+        'many_objects': len(objects) > 5,
+        'faces_detected': bool(landmarks and landmarks['face_count'] > 0)
+    }
+    weights = {'gps_location': 40, 'camera_info': 15, 'many_objects': 10, 'faces_detected': 20}
+    risk_score = min(100, 10 + sum(weights[factor] for factor, present in factors.items() if present))
+
+    risk_level = 'HIGH' if risk_score >= 60 else 'MEDIUM' if risk_score >= 40 else 'LOW'
+
+    return {
+        'score': risk_score,
+        'level': risk_level,
+        'factors': factors,
+        'recommendations': get_privacy_recommendations(risk_score, gps_data, camera_info, landmarks),
+        'missing_inputs': [stage for stage in ('gps', 'camera', 'objects', 'landmarks') if stage not in stage_results]
+    }
+
+def summarize_video_risk(frame_analysis, duration):
+    """Aggregate per-frame analysis into the video privacy risk assessment"""
+    face_count = 0
+    text_count = 0
+    location_clue_count = 0
+    license_plate_count = 0
+
+    for analysis in frame_analysis:
+        face_count += analysis['landmarks']['face_count']
+        text_count += len(analysis['text_detections']['general_text'])
+        location_clue_count += sum(len(clues) for clues in analysis['location_clues'].values())
+        license_plate_count += len(analysis['text_detections']['license_plates'])
+
+    return video_risk(duration, face_count, license_plate_count, text_count, location_clue_count)
+
+def summarize_tracked_video_risk(unique_counts, duration):
+    """Video privacy risk from dense analysis, counting each tracked face and plate once"""
+    return video_risk(duration, unique_counts.get('face', 0), unique_counts.get('license_plate', 0))
+
+def video_risk(duration, face_count, license_plate_count, text_count=0, location_clue_count=0):
+    """Score a video from its face, plate, text and location clue counts"""
+    risk_score = 10
+
+    if duration > 3600:
+        risk_score += 10
+
+    if face_count > 0:
+        risk_score += 20
+    if license_plate_count > 0:
+        risk_score += 30
+    if text_count > 10:
+        risk_score += 15
+    if location_clue_count > 5:
+        risk_score += 10
+
+    risk_level = 'HIGH' if risk_score >= 60 else 'MEDIUM' if risk_score >= 40 else 'LOW'
+
+    return {
+        'score': risk_score,
+        'level': risk_level,
+        'face_count': face_count,
+        'text_detections_count': text_count,
+        'location_clues_count': location_clue_count,
+        'license_plates_count': license_plate_count,
+        'recommendations': [
+            "Video contains personal/identifying information" if face_count > 0 else "No faces detected",
+            f"Detected {license_plate_count} license plate(s) - consider blurring" if license_plate_count > 0 else "No license plates detected",
+            f"Found {text_count} text elements and {location_clue_count} location clues" if (text_count + location_clue_count) > 0 else "Minimal location data detected",
+            "Consider removing or blurring identifiable content before sharing",
+            "Use tools like FFmpeg to re-encode without metadata",
+        ]
+    }
+
+def get_privacy_recommendations(risk_score, gps_data, camera_info, landmarks):
+    """Generate privacy recommendations based on analysis"""
+    recommendations = []
+
+    if gps_data:
+        recommendations.append("⚠️ GPS location data detected - consider removing before sharing")
+
+    if camera_info:
+        recommendations.append("⚠️ Camera information detected - model and settings exposed")
+
+    if landmarks and landmarks['face_count'] > 0:
+        recommendations.append(f"⚠️ {landmarks['face_count']} face(s) detected - consider blurring before sharing")
+
+    if landmarks and landmarks['hand_count'] > 0:
+        recommendations.append(f"⚠️ {landmarks['hand_count']} hand(s) detected")
+
+    if risk_score >= 60:
+        recommendations.append("🔴 HIGH RISK: Remove all metadata and consider re-encoding")
+    elif risk_score >= 40:
+        recommendations.append("🟡 MEDIUM RISK: Consider removing metadata before sharing")
+    else:
+        recommendations.append("🟢 LOW RISK: Generally safe to share, but review content")
+
+    return recommendations
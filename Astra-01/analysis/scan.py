@@ -0,0 +1,343 @@
+"""
+Bulk analysis of a directory tree (scan_directory.py)
+Images are hashed and analyzed with the /api/analyze-image pipeline in a pool of worker
+processes. Results are written to JSONL or Parquet in batches; after each batch a
+checkpoint records the files done and the committed output position, so a crashed or
+interrupted scan resumes where it stopped. Files whose content was already analyzed
+(same SHA-256) are recorded as duplicates instead of being analyzed again; a duplicate
+is committed with or after the record it points to, and only successful analyses
+count as done content.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from . import engines
+from . import gating
+from . import store
+from .config import CPU_COUNT, settings
+from .media import IMAGE_EXTENSIONS, file_sha256, format_size
+from .pipeline import analyze_image_file, plan_image_stages
+from .segments import init_worker
+
+# Flat Parquet columns; the full analysis is kept as JSON in `result`
+PARQUET_COLUMNS = [
+    ('path', 'string'), ('status', 'string'), ('error', 'string'), ('sha256', 'string'), ('duplicate_of', 'string'),
+    ('size', 'int64'), ('width', 'int64'), ('height', 'int64'), ('format', 'string'),
+    ('camera_make', 'string'), ('camera_model', 'string'), ('captured_at', 'string'),
+    ('latitude', 'float64'), ('longitude', 'float64'), ('face_count', 'int64'), ('plate_count', 'int64'),
+    ('object_count', 'int64'), ('risk_level', 'string'), ('risk_score', 'int64'), ('result', 'string'),
+]
+
+def iter_images(root):
+    """Image files under `root` as paths relative to it, in a stable order"""
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.relpath(os.path.join(directory, filename), root)
+
+def hash_file(path):
+    """Worker task: (sha256, size)"""
+    return file_sha256(path), os.path.getsize(path)
+
+def analyze_file(path, relpath, plan, unavailable, gating_rules, sha256):
+    """Worker task: the output record for one image"""
+    try:
+        analysis = analyze_image_file(path, os.path.basename(path), plan, unavailable, gating_rules, sha256)
+        return {'path': relpath, 'status': 'success', 'sha256': sha256, **analysis}
+    except Exception as e:
+        return {'path': relpath, 'status': 'error', 'sha256': sha256, 'error': str(e)}
+
+class JsonlOutput:
+    """One JSON record per line; the position is the committed byte length"""
+
+    def __init__(self, path, position):
+        self.file = open(path, 'ab')
+        self.file.truncate(position)  # drop records written after the last checkpoint
+
+    def write(self, records):
+        self.file.write(''.join(json.dumps(record, default=str) + '\n' for record in records).encode())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+class ParquetOutput:
+    """A directory of part files, one per batch; the position is the committed part count"""
+
+    def __init__(self, directory, position):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit('Parquet output needs pyarrow (pip install pyarrow)')
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.schema = pyarrow.schema([(name, getattr(pyarrow, kind)()) for name, kind in PARQUET_COLUMNS])
+        self.directory = directory
+        self.parts = position
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            number = name.split('.')[0].rpartition('-')[2]
+            if name.endswith('.tmp') or (number.isdigit() and int(number) >= position):
+                os.remove(os.path.join(directory, name))
+
+    def write(self, records):
+        rows = [parquet_row(record) for record in records]
+        table = self.pa.Table.from_pylist(rows, schema=self.schema)
+        path = os.path.join(self.directory, f"part-{self.parts:05d}.parquet")
+        self.pq.write_table(table, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self.parts += 1
+        return self.parts
+
+    def close(self):
+        pass
+
+def parquet_row(record):
+    row = {name: record.get(name) for name, _ in PARQUET_COLUMNS}
+    if record['status'] == 'success':
+        summary = store.image_summary(record)
+        file_info = record['file_info']
+        row.update({name: summary[name] for name in ('camera_make', 'camera_model', 'captured_at', 'latitude', 'longitude',
+                                                     'face_count', 'plate_count', 'object_count', 'risk_level', 'risk_score')})
+        row.update({name: file_info.get(name) for name in ('size', 'width', 'height', 'format')})
+        row['result'] = json.dumps(record, default=str)
+    return row
+
+class Checkpoint:
+    """Append-only log of committed batches: {"position": ..., "files": [[path, sha256, status], ...]}"""
+
+    def __init__(self, path):
+        self.path = path
+        self.position = 0
+        self.done_paths = set()
+        self.done_hashes = {}  # sha256 -> path of a successful analysis
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # a torn last line: that batch was not committed
+                    self.position = entry['position']
+                    for relpath, sha256, status in entry['files']:
+                        # Files that failed are tried again on resume
+                        if status in ('success', 'duplicate'):
+                            self.done_paths.add(relpath)
+                        if sha256 and status == 'success':
+                            self.done_hashes.setdefault(sha256, relpath)
+        self.file = open(path, 'a')
+
+    def commit(self, position, records):
+        self.position = position
+        self.file.write(json.dumps({'position': position,
+                                    'files': [[record['path'], record.get('sha256'), record['status']]
+                                              for record in records]}) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class ScanReport:
+    """Counts, bytes and per-stage time for the throughput report"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.counts = defaultdict(int)
+        self.bytes = 0
+        self.stage_ms = defaultdict(float)
+        self.stage_runs = defaultdict(int)
+
+    def add(self, record, size=0):
+        self.counts[record['status']] += 1
+        if record['status'] == 'success':
+            self.bytes += size
+            for stage, entry in record.get('stage_report', {}).items():
+                if 'duration_ms' in entry:
+                    self.stage_ms[stage] += entry['duration_ms']
+                    self.stage_runs[stage] += 1
+
+    def summary(self):
+        seconds = time.perf_counter() - self.start
+        analyzed = self.counts['success']
+        return {
+            'seconds': round(seconds, 1),
+            'counts': dict(self.counts),
+            'bytes_analyzed': self.bytes,
+            'files_per_second': round(analyzed / seconds, 2) if seconds else 0,
+            'mb_per_second': round(self.bytes / (1024 * 1024) / seconds, 2) if seconds else 0,
+            'mean_stage_ms': {stage: round(self.stage_ms[stage] / runs, 1) for stage, runs in self.stage_runs.items()}
+        }
+
+def print_report(summary):
+    counts = summary['counts']
+    print(f"[INFO] Analyzed {counts.get('success', 0)} images ({format_size(summary['bytes_analyzed'])}) in "
+          f"{summary['seconds']}s: {summary['files_per_second']} files/s, {summary['mb_per_second']} MB/s")
+    print(f"[INFO] Duplicates {counts.get('duplicate', 0)}, already done {counts.get('resumed', 0)}, "
+          f"errors {counts.get('error', 0)}")
+    if summary['mean_stage_ms']:
+        stages = sorted(summary['mean_stage_ms'].items(), key=lambda item: -item[1])
+        print('[INFO] Mean stage time: ' + ', '.join(f"{stage} {ms}ms" for stage, ms in stages))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze every image under a directory')
+    parser.add_argument('root', help='directory to scan')
+    parser.add_argument('--output', required=True, help='JSONL file, or Parquet directory with --format parquet')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'],
+                        help='output format (default: from the output extension)')
+    parser.add_argument('--checkpoint', help='checkpoint file (default: <output>.checkpoint)')
+    parser.add_argument('--workers', type=int, default=settings['SCAN_WORKERS'], help='worker processes')
+    parser.add_argument('--profile', default=settings['PROFILE'], help="deployment profile ('full' or 'lite')")
+    parser.add_argument('--stages', help='analyze-image stages, e.g. exif,gps,camera,hash')
+    parser.add_argument('--gating', help="stage gating overrides ('hands=always,...' or 'off')")
+    parser.add_argument('--commit-every', type=int, default=settings['SCAN_COMMIT_EVERY'],
+                        help='records per output batch and checkpoint')
+    parser.add_argument('--store', action='store_true', help='also add summaries to the results store (ASTRA_RESULTS_DB)')
+    parser.add_argument('--report', help='write the throughput report as JSON to this file')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = os.path.abspath(args.root)
+    if not os.path.isdir(root):
+        raise SystemExit(f"Not a directory: {args.root}")
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    checkpoint_path = args.checkpoint or args.output.rstrip('/') + '.checkpoint'
+    if os.path.exists(args.output) and not os.path.exists(checkpoint_path):
+        raise SystemExit(f"{args.output} exists without a checkpoint; remove it or pass --checkpoint")
+
+    engines.configure(args.profile)
+    try:
+        plan, unavailable = plan_image_stages(args.stages)
+        gating_rules = gating.resolve_rules(args.gating)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    checkpoint = Checkpoint(checkpoint_path)
+    output = (ParquetOutput if output_format == 'parquet' else JsonlOutput)(args.output, checkpoint.position)
+    connection = store.create_schema() if args.store and store.enabled() else None
+    if checkpoint.done_paths:
+        print(f"[INFO] Resuming: {len(checkpoint.done_paths)} files already done")
+
+    workers = max(1, args.workers)
+    threads = max(1, CPU_COUNT // workers)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_worker, initargs=(args.profile, threads))
+    print(f"[INFO] Scanning {root} with {workers} workers ({threads} threads each)")
+
+    report = ScanReport()
+    analyzed = dict(checkpoint.done_hashes)  # sha256 -> path successfully analyzed
+    analyzing = {}  # sha256 -> path being analyzed
+    waiting = defaultdict(list)  # sha256 -> (path, size) of duplicates of content being analyzed
+    sizes = {}
+    batch = []
+
+    def commit():
+        if not batch:
+            return
+        position = output.write(batch)
+        if connection is not None:
+            with connection:
+                store.insert_items(connection, [store.image_summary(record) for record in batch
+                                                if record['status'] == 'success'])
+        checkpoint.commit(position, batch)
+        batch.clear()
+
+    def finish(record, size=0):
+        report.add(record, size)
+        batch.append(record)
+        if len(batch) >= args.commit_every:
+            commit()
+
+    def duplicate(relpath, sha256):
+        return {'path': relpath, 'status': 'duplicate', 'sha256': sha256, 'duplicate_of': analyzed[sha256]}
+
+    def analyze(relpath, sha256, size):
+        analyzing[sha256] = relpath
+        sizes[relpath] = size
+        future = executor.submit(analyze_file, os.path.join(root, relpath), relpath, plan, unavailable,
+                                 gating_rules, sha256)
+        running[future] = ('analyze', relpath)
+
+    def analysis_done(record):
+        """Release duplicates behind the batch holding their source, or retry one if the source failed"""
+        sha256 = record['sha256']
+        del analyzing[sha256]
+        finish(record, sizes.pop(record['path'], 0))
+        if record['status'] == 'success':
+            analyzed[sha256] = record['path']
+            for relpath, _ in waiting.pop(sha256, []):
+                finish(duplicate(relpath, sha256))
+        elif waiting.get(sha256):
+            relpath, size = waiting[sha256].pop(0)
+            analyze(relpath, sha256, size)
+
+    paths = iter_images(root)
+    running = {}  # future -> (task, relpath)
+    max_running = workers * 4
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(running) < max_running:
+                relpath = next(paths, None)
+                if relpath is None:
+                    exhausted = True
+                elif relpath in checkpoint.done_paths:
+                    report.counts['resumed'] += 1
+                else:
+                    running[executor.submit(hash_file, os.path.join(root, relpath))] = ('hash', relpath)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, relpath = running.pop(future)
+                if task == 'analyze':
+                    analysis_done(future.result())
+                    continue
+                try:
+                    sha256, size = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    finish({'path': relpath, 'status': 'error', 'error': str(e)})
+                    continue
+                if sha256 in analyzed:
+                    finish(duplicate(relpath, sha256))
+                elif sha256 in analyzing:
+                    waiting[sha256].append((relpath, size))  # uncommitted until its source is
+                else:
+                    analyze(relpath, sha256, size)
+    except BrokenProcessPool:
+        print("Error: a worker process died; rerun the same command to resume from the checkpoint")
+        raise SystemExit(1)
+    except KeyboardInterrupt:
+        print("[WARNING] Interrupted; rerun the same command to resume from the checkpoint")
+        raise SystemExit(130)
+    finally:
+        commit()
+        executor.shutdown(wait=False, cancel_futures=True)
+        output.close()
+        checkpoint.close()
+        if connection is not None:
+            connection.close()
+        summary = report.summary()
+        print_report(summary)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(summary, f, indent=2)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+A small stage-graph executor
+Each stage names the stage outputs it needs; stages whose inputs are ready run
+concurrently (OpenCV, torch and MediaPipe release the GIL in native code), so
+independent stages overlap instead of adding up. Running stages hold a slot of the
+request's admission pool, so metadata-only requests never queue behind inference
+stages, and each graph runs at most STAGE_REQUEST_WORKERS stages at once.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from . import metrics
+from .config import settings
+
+# The admission pool of the request being served; admission.limit sets it
+current_pool = contextvars.ContextVar('stage_pool', default='inference')
+
+_slots = {}
+_slots_lock = threading.Lock()
+
+# While a submitted stage waits for a slot, check for its start this often
+START_POLL_SECONDS = 0.05
+
+def stage(name, run, needs=(), after=(), timeout=None):
+    """Declare a stage: `run(results)` gets the outputs produced so far.
+
+    `needs` must have succeeded for the stage to run; `after` only has to have
+    finished (any outcome). `timeout` defaults to STAGE_TIMEOUTS / STAGE_TIMEOUT_SECONDS.
+    """
+    return {'name': name, 'run': run, 'needs': tuple(needs), 'after': tuple(after), 'timeout': timeout}
+
+def get_slots(pool):
+    """Stage slots shared by every graph running under admission pool `pool`"""
+    with _slots_lock:
+        if pool not in _slots:
+            size = settings['CHEAP_STAGE_WORKERS'] if pool == 'cheap' else settings['STAGE_WORKERS']
+            _slots[pool] = threading.Semaphore(size)
+        return _slots[pool]
+
+def stage_timeout(name):
+    return float(settings['STAGE_TIMEOUTS'].get(name, settings['STAGE_TIMEOUT_SECONDS']))
+
+def timeout_of(spec):
+    return spec['timeout'] or stage_timeout(spec['name'])
+
+def _call(spec, inputs):
+    start = time.perf_counter()
+    with metrics.stage_timer(f"graph_{spec['name']}"):
+        output = spec['run'](inputs)
+    return output, time.perf_counter() - start
+
+class StageRun:
+    """One stage on its own thread, holding a slot from `slots` until the thread exits.
+
+    `started` is set once it has a slot; its timeout counts from then. A
+    timed-out stage is abandoned by its graph but keeps its slot while the
+    thread finishes in the background, so the slot count bounds real work.
+    """
+
+    def __init__(self, spec, inputs, slots):
+        self.name = spec['name']
+        self.future = Future()
+        self.started = None
+        self._slots = slots
+        # Each stage runs in a copy of the caller's context so profiling sections nest under the request
+        context = contextvars.copy_context()
+        threading.Thread(target=self._run, args=(context, spec, inputs), name=f"stage-{self.name}", daemon=True).start()
+
+    def _run(self, context, spec, inputs):
+        self._slots.acquire()
+        self.started = time.perf_counter()
+        try:
+            result = context.run(_call, spec, inputs)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+        finally:
+            self._slots.release()
+
+def run_graph(stages, pool=None):
+    """Run a stage graph; returns ({stage: output}, {stage: status report}).
+
+    Stages run as soon as their inputs are ready and a slot of `pool` (the
+    current request's admission pool by default) is free. A stage that fails
+    or overruns its timeout, counted from when it starts, produces no output,
+    and stages needing it are skipped. Timed-out work cannot be interrupted:
+    its thread finishes in the background, still holding its slot, and the
+    result is discarded.
+    """
+    specs = {spec['name']: spec for spec in stages}
+    results = {}
+    report = {}
+    running = {}  # future -> StageRun
+    pending = dict(specs)
+    slots = get_slots(pool or current_pool.get())
+    width = settings['STAGE_REQUEST_WORKERS']
+
+    while pending or running:
+        progressed = False
+        for name, spec in list(pending.items()):
+            failed = [need for need in spec['needs'] if need in report and report[need]['status'] != 'ok']
+            if failed:
+                report[name] = {'status': 'skipped', 'reason': f"needs {', '.join(failed)}"}
+                del pending[name]
+                progressed = True
+                continue
+            if len(running) < width and all(dependency in report for dependency in spec['needs'] + spec['after']):
+                run = StageRun(spec, dict(results), slots)
+                running[run.future] = run
+                del pending[name]
+                progressed = True
+        if not running:
+            if progressed:
+                continue
+            for name in pending:
+                report[name] = {'status': 'skipped', 'reason': 'inputs not in the graph'}
+            break
+
+        now = time.perf_counter()
+        deadlines = [run.started + timeout_of(specs[run.name]) for run in running.values() if run.started is not None]
+        wait_seconds = max(0.0, min(deadlines) - now) if deadlines else None
+        if len(deadlines) < len(running):
+            wait_seconds = START_POLL_SECONDS if wait_seconds is None else min(wait_seconds, START_POLL_SECONDS)
+        done, _ = wait(running, timeout=wait_seconds, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future).name
+            try:
+                output, seconds = future.result()
+                results[name] = output
+                report[name] = {'status': 'ok', 'duration_ms': round(seconds * 1000, 1)}
+            except Exception as e:
+                print(f"Error in stage {name}: {e}")
+                report[name] = {'status': 'error', 'error': str(e)}
+        now = time.perf_counter()
+        for future, run in list(running.items()):
+            timeout = timeout_of(specs[run.name])
+            if run.started is not None and now >= run.started + timeout and not future.done():
+                del running[future]
+                print(f"[WARNING] Stage {run.name} timed out after {timeout}s")
+                metrics.stage_errors.inc(stage=f"graph_{run.name}_timeout")
+                report[run.name] = {'status': 'timeout'}
+
+    return results, report
@@ -0,0 +1,158 @@
+"""
+Segment-parallel analysis of long videos
+The sampled timeline is split into contiguous segments handed to worker processes;
+each opens its own capture, seeks to its segment and analyzes its frames with its
+own models (ultralytics and EasyOCR models are not safe to share across threads).
+Results are merged back in frame order.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+
+from . import engines
+from . import metrics
+from . import thumbnails
+from .config import CPU_COUNT, settings
+from .media import encode_frame
+from .pipeline import analyze_sampled_frames
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def sample_frame_numbers(total_frames, max_frames):
+    """The evenly spaced frame numbers iter_video_frames would decode"""
+    frame_interval = max(1, total_frames // max_frames)
+    return [i * frame_interval for i in range(max_frames) if i * frame_interval < total_frames]
+
+def plan_segments(total_frames, max_frames, segments):
+    """Split the sampled frame numbers into up to `segments` contiguous runs"""
+    frame_numbers = sample_frame_numbers(total_frames, max_frames)
+    segments = max(1, min(segments, len(frame_numbers)))
+    size, extra = divmod(len(frame_numbers), segments)
+    plan = []
+    start = 0
+    for i in range(segments):
+        end = start + size + (1 if i < extra else 0)
+        plan.append(frame_numbers[start:end])
+        start = end
+    return [segment for segment in plan if segment]
+
+def worker_threads():
+    """Each worker process gets an equal share of the cores"""
+    return max(1, CPU_COUNT // settings['VIDEO_WORKERS'])
+
+def init_worker(profile_name, threads):
+    """Process pool initializer: per-worker thread limits and the engine profile"""
+    # Runs before any model import in the worker, so torch picks these up
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[variable] = str(threads)
+    settings['INFERENCE_THREADS'] = threads
+    cv2.setNumThreads(threads)
+    engines.configure(profile_name)
+
+def get_executor():
+    """The process pool, started on first use; workers keep their models between requests"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: a forked copy of a threaded server can inherit held locks. Spawned
+            # workers re-import the launching script; create_app starts no services there
+            _executor = ProcessPoolExecutor(
+                max_workers=settings['VIDEO_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(engines.active_profile()['name'], worker_threads())
+            )
+            print(f"[INFO] Started {settings['VIDEO_WORKERS']} video segment workers ({worker_threads()} threads each)")
+        return _executor
+
+def _reset_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def read_segment_frames(video_path, frame_numbers):
+    """Decode the given (ascending) frame numbers with one capture.
+
+    Seeks to the segment start and across long gaps; shorter gaps are only
+    grabbed, which is cheaper than a keyframe seek.
+    """
+    cap = cv2.VideoCapture(video_path)
+    sampled = []
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        position = None
+        for frame_number in frame_numbers:
+            if position is None or frame_number - position > settings['VIDEO_SEEK_FRAMES']:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                position = frame_number
+            while position < frame_number and cap.grab():
+                position += 1
+            if position != frame_number:
+                break
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position += 1
+            sampled.append((frame_number, frame_number / fps if fps > 0 else 0, frame))
+    finally:
+        cap.release()
+    return sampled
+
+def analyze_segment(video_path, frame_numbers, ocr_options, delivery, store_options):
+    """Worker task: decode and analyze one segment; returns [(frame, analysis)] in frame order.
+
+    Frames carry thumbnail keys rather than URLs; the request resolves them.
+    """
+    sampled = read_segment_frames(video_path, frame_numbers)
+    results = []
+    # Near-duplicates are detected within the segment; each worker has its own signatures
+    analyses = analyze_sampled_frames(sampled, ocr_options)
+    for (frame_number, timestamp, frame), analysis in zip(sampled, analyses):
+        frame_data = {'frame_number': frame_number, 'timestamp': timestamp}
+        if delivery == 'inline':
+            frame_data['image'] = encode_frame(frame)
+        else:
+            frame_data['thumbnail_keys'] = thumbnails.write_frame(frame, **store_options)
+        results.append((frame_data, analysis))
+    return results
+
+def _resolve_frame(frame_data):
+    keys = frame_data.pop('thumbnail_keys', None)
+    if keys is not None:
+        urls = thumbnails.key_urls(keys)
+        frame_data['image'] = thumbnails.primary_url(urls)
+        frame_data['thumbnails'] = urls
+    return frame_data
+
+def iter_segment_results(video_path, total_frames, max_frames, segments, ocr_options, delivery):
+    """Yield (frame, analysis) in frame order, analyzing all segments in parallel.
+
+    Segments are collected in timeline order, so earlier frames can be
+    streamed while later segments are still being analyzed. Needs a request
+    context to build thumbnail URLs.
+    """
+    executor = get_executor()
+    store_options = thumbnails.store_options()
+    futures = [executor.submit(analyze_segment, video_path, frame_numbers, ocr_options, delivery, store_options)
+               for frame_numbers in plan_segments(total_frames, max_frames, segments)]
+    try:
+        for future in futures:
+            with metrics.stage_timer('video_segment_wait'):
+                results = future.result()
+            for frame_data, analysis in results:
+                yield _resolve_frame(frame_data), analysis
+        thumbnails.sweep_expired()
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,766 @@
+"""
+HTTP API over the analysis package
+create_app(profile) builds the Flask app for a deployment profile; routes are
+shared, and stages the profile leaves out are reported rather than run
+"""
+
+import base64
+import json
+import multiprocessing
+import os
+import threading
+from datetime import datetime
+from io import BytesIO
+from itertools import islice
+
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, send_file, stream_with_context
+from flask_cors import CORS
+from PIL import Image
+from werkzeug.utils import secure_filename
+
+from . import admission
+from . import engines
+from . import gating
+from . import metrics
+from . import models
+from . import profiling
+from . import segments
+from . import store
+from . import text  # registers the text_nlp engine
+from . import thumbnails
+from . import tracking
+from . import uploads
+from .config import settings
+from .media import (METADATA_EXTENSIONS, allowed_file, copy_without_metadata, decode_image_bytes, discard_upload, frame_image_fields,
+                    iter_video_frames, save_upload, video_file_info)
+from .metadata import MetadataBeyondPrefix, extract_camera_info, extract_exif_header, extract_gps_data
+from .ocr import parse_ocr_langs
+from .pipeline import FrameDedup, analyze_image_file, analyze_sampled_frames, plan_image_stages
+from .risk import summarize_tracked_video_risk, summarize_video_risk
+
+api = Blueprint('api', __name__)
+
+def stage_disabled_response(stage):
+    profile = engines.active_profile()
+    return jsonify({'error': f"{stage} is not enabled in the {profile['name']} profile"}), 503
+
+# analyze-image stages that never load a model
+METADATA_STAGES = {'exif', 'gps', 'camera', 'hash'}
+
+def image_pool():
+    """Metadata-only stage selections run in the cheap pool, everything else in the inference pool"""
+    try:
+        plan, _ = plan_image_stages(request.values.get('stages'))
+    except ValueError:
+        return 'cheap'  # the view rejects the request
+    return 'cheap' if set(plan) <= METADATA_STAGES else 'inference'
+
+def upload_error_response(error):
+    """JSON error for a chunked upload; conflicts carry the offset to resume from"""
+    body = {'error': str(error)}
+    if error.offset is not None:
+        body['offset'] = error.offset
+    response = jsonify(body)
+    response.status_code = error.status
+    if error.offset is not None:
+        response.headers['Upload-Offset'] = str(error.offset)
+    return response
+
+def validate_file_field():
+    """Error response for a missing or disallowed multipart `file`, else None"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    return None
+
+def accept_upload():
+    """(filename, filepath, sha256) of the multipart `file`, or of the finalized chunked upload named by `upload_id`
+
+    The SHA-256 is computed while the file is saved, or verified at finalize;
+    raises uploads.UploadError.
+    """
+    upload_id = request.values.get('upload_id')
+    if upload_id:
+        return uploads.claim_upload(upload_id)
+    return save_upload(request.files['file'])
+
+def finish_upload(filepath):
+    """Delete an analyzed upload unless the profile keeps uploads"""
+    if not current_app.config['KEEP_UPLOADS']:
+        discard_upload(filepath)
+
+@api.route('/api/analyze-image', methods=['POST'])
+@metrics.track_request('analyze_image')
+@profiling.profile_request
+@admission.limit(image_pool)
+def analyze_image():
+    """Analyze image metadata, objects, landmarks, and reverse search
+
+    The image is the multipart `file`, or `upload_id` of a finalized chunked
+    upload. `gating` overrides the stage gating rules ('hands=always,...', or
+    'off'). The optional `stages` parameter (e.g. `stages=exif,gps,camera`) limits the
+    work to those stages and what they depend on.
+    """
+    try:
+        if not request.values.get('upload_id'):
+            error = validate_file_field()
+            if error:
+                return error
+
+        try:
+            plan, unavailable = plan_image_stages(request.values.get('stages'))
+            gating_rules = gating.resolve_rules(request.values.get('gating'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            filename, filepath, sha256 = accept_upload()
+        except uploads.UploadError as e:
+            return upload_error_response(e)
+        try:
+            analysis = analyze_image_file(filepath, filename, plan, unavailable, gating_rules, sha256)
+        finally:
+            finish_upload(filepath)
+
+        result = {'status': 'success', **analysis}
+        store.record(store.image_summary(result))
+
+        with metrics.stage_timer('json_serialize'):
+            return jsonify(result)
+
+    except Exception as e:
+        print(f"Error analyzing image: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def video_ocr_options():
+    """OCR and stage gating settings for video analysis from the request form; raises ValueError"""
+    return {
+        'mode': request.form.get('ocr_mode'),
+        'batch_size': request.form.get('ocr_batch_size', type=int),
+        'workers': request.form.get('ocr_workers', type=int),
+        'langs': parse_ocr_langs(request.form.get('ocr_langs')),
+        'gating': gating.resolve_rules(request.form.get('gating'))
+    }
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+def format_stream_record(kind, payload, stream_format):
+    """One NDJSON line or Server-Sent Event"""
+    with metrics.stage_timer('json_serialize'):
+        if stream_format == 'sse':
+            return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps({'type': kind, **payload}) + '\n'
+
+def video_sampling():
+    """(max_frames, segments) from the request; segments=auto uses one segment per video worker"""
+    max_frames = request.values.get('max_frames', settings['VIDEO_FRAMES'], type=int)
+    if not max_frames or not 1 <= max_frames <= settings['VIDEO_MAX_FRAMES']:
+        raise ValueError(f"max_frames must be between 1 and {settings['VIDEO_MAX_FRAMES']}")
+    value = request.values.get('segments', settings['VIDEO_SEGMENTS'])
+    if value == 'auto':
+        return max_frames, settings['VIDEO_WORKERS']
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError('segments must be a positive number or auto')
+    return max_frames, int(value)
+
+def dense_options():
+    """Keyframe interval and decode rate for dense=1, or None for sampled analysis"""
+    if request.values.get('dense') not in ('1', 'true'):
+        return None
+    options = {
+        'detect_every': request.values.get('detect_every', settings['VIDEO_DETECT_EVERY'], type=int),
+        'fps': request.values.get('dense_fps', settings['VIDEO_DENSE_FPS'], type=float)
+    }
+    if not options['detect_every'] or options['detect_every'] < 1 or not options['fps'] or options['fps'] <= 0:
+        raise ValueError('detect_every and dense_fps must be positive')
+    return options
+
+def iter_analyzed_frames(filepath, file_info, sampling, ocr_options, delivery):
+    """Yield (frame, analysis) per sampled frame in frame order, from segment workers when segments > 1.
+
+    Without segments, frames are analyzed in windows of OCR_FRAME_BATCH.
+    """
+    max_frames, segment_count = sampling
+    if segment_count > 1 and settings['VIDEO_WORKERS'] > 1:
+        yield from segments.iter_segment_results(filepath, file_info['total_frames'], max_frames, segment_count,
+                                                 ocr_options, delivery)
+        return
+    # OCR_FRAME_BATCH frames at a time, so their OCR shares one recognition pass
+    dedup = FrameDedup()
+    sampled_frames = iter_video_frames(filepath, max_frames=max_frames)
+    try:
+        while True:
+            sampled = list(islice(sampled_frames, max(1, settings['OCR_FRAME_BATCH'])))
+            if not sampled:
+                break
+            analyses = analyze_sampled_frames(sampled, ocr_options, dedup)
+            for (frame_number, timestamp, frame), analysis in zip(sampled, analyses):
+                yield {'frame_number': frame_number, 'timestamp': timestamp, **frame_image_fields(frame, delivery)}, analysis
+    finally:
+        sampled_frames.close()
+
+def stream_video_analysis(filepath, file_info, sampling, ocr_options, stream_format, delivery):
+    """Stream file info, then each frame as soon as it is analyzed, then the aggregate risk"""
+    keep_upload = current_app.config['KEEP_UPLOADS']
+
+    def generate():
+        yield format_stream_record('file_info', {'status': 'success', 'file_info': file_info}, stream_format)
+
+        # Only the small per-frame analysis dicts are kept for the final aggregate
+        frame_analysis = []
+        try:
+            for frame, analysis in iter_analyzed_frames(filepath, file_info, sampling, ocr_options, delivery):
+                frame_analysis.append(analysis)
+                yield format_stream_record('frame', {'frame': frame, 'analysis': analysis}, stream_format)
+
+            privacy_risk = summarize_video_risk(frame_analysis, file_info['duration'])
+            store.record(store.video_summary(file_info, privacy_risk, frame_analysis=frame_analysis))
+            yield format_stream_record('privacy_risk', {'privacy_risk': privacy_risk}, stream_format)
+        except Exception as e:
+            print(f"Error streaming video analysis: {e}")
+            yield format_stream_record('error', {'error': str(e)}, stream_format)
+        finally:
+            if not keep_upload:
+                discard_upload(filepath)
+
+    response = Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[stream_format])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a reverse proxy buffer the stream
+    return response
+
+@api.route('/api/analyze-video', methods=['POST'])
+@metrics.track_request('analyze_video')
+@profiling.profile_request
+@admission.limit('inference')
+def analyze_video():
+    """Analyze video metadata, extract frames, and detect objects/landmarks in each frame
+
+    With `stream=ndjson` or `stream=sse` the result is streamed record by
+    record: file info, one record per analyzed frame, then the privacy risk.
+    Frames are returned as thumbnail URLs unless `frames=inline` asks for
+    base64 data URLs. `gating` overrides the stage gating rules for the
+    frames. Instead of `file`, `upload_id` names a finalized
+    chunked upload. `max_frames` sets how many frames are sampled;
+    `segments=N` (or `auto`) splits them into N timeline segments analyzed in
+    parallel worker processes, for long videos. `dense=1` instead decodes
+    `dense_fps` frames per second, detects on every `detect_every`th one and
+    tracks objects in between, returning unique tracks and counts.
+    """
+    try:
+        if not request.values.get('upload_id'):
+            error = validate_file_field()
+            if error:
+                return error
+
+        stream_format = request.values.get('stream')
+        if stream_format and stream_format not in STREAM_MIMETYPES:
+            return jsonify({'error': f"stream must be one of: {', '.join(STREAM_MIMETYPES)}"}), 400
+
+        delivery = request.values.get('frames', settings['FRAME_DELIVERY'])
+        if delivery not in ('url', 'inline'):
+            return jsonify({'error': 'frames must be url or inline'}), 400
+
+        try:
+            sampling = video_sampling()
+            dense = dense_options()
+            ocr_options = video_ocr_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if dense and (stream_format or sampling[1] > 1):
+            return jsonify({'error': 'dense cannot be combined with stream or segments'}), 400
+
+        try:
+            filename, filepath, sha256 = accept_upload()
+        except uploads.UploadError as e:
+            return upload_error_response(e)
+        file_info = video_file_info(filepath, filename)
+        if sha256:
+            file_info['sha256'] = sha256
+
+        if stream_format:
+            # The stream's generator removes the upload once it is done with it
+            return stream_video_analysis(filepath, file_info, sampling, ocr_options, stream_format, delivery)
+
+        if dense:
+            try:
+                dense_analysis = tracking.analyze_dense(filepath, langs=ocr_options['langs'], **dense)
+            finally:
+                finish_upload(filepath)
+            result = {
+                'status': 'success',
+                'file_info': file_info,
+                'dense_analysis': dense_analysis,
+                'privacy_risk': summarize_tracked_video_risk(dense_analysis['unique_counts'], file_info['duration'])
+            }
+            store.record(store.video_summary(file_info, result['privacy_risk'], dense_analysis=dense_analysis))
+            with metrics.stage_timer('json_serialize'):
+                return jsonify(result)
+
+        max_frames, segment_count = sampling
+        if segment_count > 1 and settings['VIDEO_WORKERS'] > 1:
+            # Segments are decoded and analyzed in worker processes, merged in frame order
+            try:
+                analyzed = list(iter_analyzed_frames(filepath, file_info, sampling, ocr_options, delivery))
+            finally:
+                finish_upload(filepath)
+            frames = [frame for frame, _ in analyzed]
+            frame_analysis = [analysis for _, analysis in analyzed]
+        else:
+            # Frames are decoded and analyzed a chunk at a time, so only one chunk of
+            # full-resolution frames is held; near-duplicates reuse earlier results
+            frames = []
+            frame_analysis = []
+            dedup = FrameDedup()
+            sampled_frames = iter_video_frames(filepath, max_frames=max_frames)
+            try:
+                while True:
+                    with metrics.stage_timer('frame_extract'):
+                        sampled = list(islice(sampled_frames, settings['VIDEO_FRAME_CHUNK']))
+                    if not sampled:
+                        break
+                    frames.extend({
+                        'frame_number': frame_number,
+                        'timestamp': frame_timestamp,
+                        **frame_image_fields(frame, delivery)
+                    } for frame_number, frame_timestamp, frame in sampled)
+                    frame_analysis.extend(analyze_sampled_frames(sampled, ocr_options, dedup))
+            finally:
+                sampled_frames.close()
+                finish_upload(filepath)
+
+        result = {
+            'status': 'success',
+            'file_info': file_info,
+            'extracted_frames': frames,
+            'frame_analysis': frame_analysis,
+            'privacy_risk': summarize_video_risk(frame_analysis, file_info['duration'])
+        }
+        store.record(store.video_summary(file_info, result['privacy_risk'], frame_analysis=frame_analysis))
+
+        with metrics.stage_timer('json_serialize'):
+            return jsonify(result)
+
+    except Exception as e:
+        print(f"Error analyzing video: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/uploads', methods=['POST'])
+@metrics.track_request('upload_init')
+def upload_init():
+    """Start a resumable upload: JSON {filename, size?, sha256?}; chunks then go to PUT /api/uploads/<id>"""
+    try:
+        data = request.get_json(silent=True) or {}
+        size = data.get('size')
+        if size is not None and not isinstance(size, int):
+            return jsonify({'error': 'size must be an integer'}), 400
+        record = uploads.create_upload(data.get('filename'), size=size, sha256=data.get('sha256'))
+        return jsonify(uploads.describe(record)), 201
+    except uploads.UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        print(f"Error starting upload: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def chunk_offset():
+    """Start offset of a chunk from `Upload-Offset`, or `Content-Range: bytes start-end/total`"""
+    if request.headers.get('Upload-Offset') is not None:
+        value = request.headers['Upload-Offset']
+    else:
+        value = request.headers.get('Content-Range', '').replace('bytes ', '').split('-', 1)[0]
+    if not value.strip().isdigit():
+        raise uploads.UploadError('Upload-Offset or Content-Range header required')
+    return int(value)
+
+@api.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Upload state, including the offset to resume from"""
+    try:
+        return jsonify(uploads.describe(uploads.get_upload(upload_id)))
+    except uploads.UploadError as e:
+        return upload_error_response(e)
+
+@api.route('/api/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+@metrics.track_request('upload_chunk')
+def upload_chunk(upload_id):
+    """Write the raw request body at the given offset; responds with the next offset"""
+    try:
+        offset = uploads.write_chunk(upload_id, chunk_offset(), request.stream, request.content_length)
+        response = jsonify({'upload_id': upload_id, 'offset': offset})
+        response.headers['Upload-Offset'] = str(offset)
+        return response
+    except uploads.UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        print(f"Error writing upload chunk: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+@metrics.track_request('upload_finalize')
+@admission.limit('cheap')
+def upload_finalize(upload_id):
+    """Verify the SHA-256 (JSON {sha256}, or the one given at init); then analyze with upload_id=<id>"""
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(uploads.describe(uploads.finalize_upload(upload_id, data.get('sha256'))))
+    except uploads.UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        print(f"Error finalizing upload: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def upload_cancel(upload_id):
+    try:
+        record = uploads.get_upload(upload_id)
+        uploads.discard(upload_id)
+        if record.get('filepath'):
+            discard_upload(record['filepath'])
+        return jsonify({'status': 'deleted', 'upload_id': upload_id})
+    except uploads.UploadError as e:
+        return upload_error_response(e)
+
+@api.route('/api/ocr-batch', methods=['POST'])
+@metrics.track_request('ocr_batch')
+@admission.limit('inference')
+def ocr_batch():
+    """Run batched OCR over several uploaded images"""
+    try:
+        if not engines.enabled('ocr'):
+            return stage_disabled_response('ocr')
+
+        files = request.files.getlist('files')
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+
+        for file in files:
+            if file.filename == '' or not allowed_file(file.filename):
+                return jsonify({'error': f'File type not allowed: {file.filename}'}), 400
+
+        # Decode in memory; nothing needs to touch the upload folder
+        images = [decode_image_bytes(file.read()) for file in files]
+
+        try:
+            ocr_langs = parse_ocr_langs(request.form.get('ocr_langs'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        text_results = engines.run(
+            'ocr',
+            images,
+            mode=request.form.get('ocr_mode'),
+            batch_size=request.form.get('ocr_batch_size', type=int),
+            workers=request.form.get('ocr_workers', type=int),
+            langs=ocr_langs
+        )
+
+        if engines.enabled('plates') and settings['PLATE_DETECTION'] == 'stage':
+            for image, text_detections in zip(images, text_results):
+                if image is not None:
+                    text_detections['license_plates'] = engines.run('plates', image, langs=ocr_langs)
+
+        return jsonify({
+            'status': 'success',
+            'results': [{
+                'filename': secure_filename(file.filename),
+                'decoded': image is not None,
+                'text_detections': text_detections
+            } for file, image, text_detections in zip(files, images, text_results)]
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/analyze-text', methods=['POST'])
+@metrics.track_request('analyze_text')
+@profiling.profile_request
+@admission.limit('inference')
+def analyze_text_endpoint():
+    """Analyze text endpoint"""
+    try:
+        if not engines.enabled('text_nlp'):
+            return stage_disabled_response('text_nlp')
+
+        data = request.json
+        if not data or 'text' not in data:
+            return jsonify({'error': 'No text provided'}), 400
+
+        result = engines.run('text_nlp', data['text'])
+        if result is None:
+            return jsonify({'error': 'Analysis failed'}), 500
+
+        return jsonify({
+            'status': 'success',
+            'data': result
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/results', methods=['GET'])
+@metrics.track_request('results_query')
+@admission.limit('cheap')
+def results_query():
+    """Look up stored analysis summaries, newest first, from the results store's indexes
+
+    Filters: kind, sha256, camera_make, camera_model, risk_level, min_faces,
+    min_plates, object (a detected class), captured_after / captured_before
+    (ISO dates), since (ISO) or since_days, and has_faces / has_plates /
+    has_gps=1. Page with limit and before_id (the last id of the previous page).
+    """
+    if not store.enabled():
+        return jsonify({'error': 'The results store is disabled'}), 503
+    try:
+        limit = min(max(1, request.args.get('limit', 100, type=int)), 1000)
+        items = store.query(request.args.to_dict(), limit=limit, before_id=request.args.get('before_id', type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error querying results: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'status': 'success',
+        'count': len(items),
+        'items': items,
+        'next_before_id': items[-1]['id'] if len(items) == limit else None
+    })
+
+@api.route('/api/results/nearby', methods=['GET'])
+@metrics.track_request('results_nearby')
+@admission.limit('cheap')
+def results_nearby():
+    """Stored items by location, from the results store's R*Tree
+
+    Either lat, lon and radius_m (nearest first, each item with distance_m) or
+    bbox=min_lon,min_lat,max_lon,max_lat (newest first, paged with before_id;
+    min_lon > max_lon crosses the antimeridian). The /api/results filters apply.
+    """
+    if not store.enabled():
+        return jsonify({'error': 'The results store is disabled'}), 503
+    try:
+        limit = min(max(1, request.args.get('limit', 100, type=int)), 1000)
+        params = request.args.to_dict()
+        if request.args.get('bbox'):
+            try:
+                min_lon, min_lat, max_lon, max_lat = (float(value) for value in request.args['bbox'].split(','))
+            except ValueError:
+                raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+            items = store.query_box(min_lat, min_lon, max_lat, max_lon, params, limit=limit,
+                                    before_id=request.args.get('before_id', type=int))
+            next_before_id = items[-1]['id'] if len(items) == limit else None
+        else:
+            lat, lon, radius_m = (request.args.get(name, type=float) for name in ('lat', 'lon', 'radius_m'))
+            if None in (lat, lon, radius_m):
+                raise ValueError('Provide lat, lon and radius_m, or bbox')
+            items = store.query_nearby(lat, lon, radius_m, params, limit=limit)
+            next_before_id = None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error querying results by location: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'status': 'success',
+        'count': len(items),
+        'items': items,
+        'next_before_id': next_before_id
+    })
+
+def metadata_params():
+    """(params, file) for /api/metadata, parsing the form only for multipart bodies
+
+    Any other body is the raw image: touching request.values/form would
+    consume the stream, so its parameters come from the query string only.
+    """
+    if request.mimetype == 'multipart/form-data':
+        return request.values, request.files.get('file')
+    return request.args, None
+
+def read_header_metadata(params, file):
+    """(exif_data, bytes read) from the header of the upload named by the request; raises UploadError
+
+    Raises MetadataBeyondPrefix when the metadata is not within the bytes a
+    header read may consume (or, for a chunked upload, the bytes received so far).
+    """
+    upload_id = params.get('upload_id')
+    if upload_id:
+        path, available, complete = uploads.data_path(upload_id)
+        with open(path, 'rb') as f:
+            try:
+                limit = settings['EXIF_HEADER_MAX_BYTES']
+                return extract_exif_header(f, limit if complete else min(available, limit))
+            except MetadataBeyondPrefix:
+                if not complete and available < settings['EXIF_HEADER_MAX_BYTES']:
+                    raise uploads.UploadError('The metadata is past the bytes received so far', 409, available)
+                raise
+    if file is not None:
+        # The multipart parser has spooled the body; read only its header, and never save it
+        return extract_exif_header(file.stream)
+    return extract_exif_header(request.stream)
+
+@api.route('/api/metadata', methods=['POST'])
+@metrics.track_request('metadata')
+@admission.limit('cheap')
+def metadata_only():
+    """EXIF, GPS and camera info read from the start of an image, without storing it
+
+    The image is the raw request body (cheapest: only the header is read off
+    the connection), a multipart `file`, or `upload_id` of a chunked upload,
+    which works as soon as the chunk holding the metadata has arrived.
+    """
+    params, file = metadata_params()
+    if not (params.get('upload_id') or file is not None or request.content_length):
+        return jsonify({'error': 'No file provided'}), 400
+    filename = params.get('filename') or (file.filename if file is not None else None)
+    if filename and not ('.' in filename and filename.rsplit('.', 1)[1].lower() in METADATA_EXTENSIONS):
+        return jsonify({'error': 'File type not allowed'}), 400
+    try:
+        exif_data, bytes_read = read_header_metadata(params, file)
+    except uploads.UploadError as e:
+        return upload_error_response(e)
+    except MetadataBeyondPrefix as e:
+        return jsonify({'error': f"Header-only read failed: {e}; use /api/analyze-image?stages=exif,gps,camera"}), 422
+    except Exception as e:
+        print(f"Error reading header metadata: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'status': 'success',
+        'bytes_read': bytes_read,
+        'exif_data': exif_data,
+        'gps_data': extract_gps_data(exif_data),
+        'camera_info': extract_camera_info(exif_data)
+    })
+
+@api.route('/api/strip-metadata', methods=['POST'])
+@metrics.track_request('strip_metadata')
+@admission.limit('cheap')
+def strip_metadata():
+    """Remove metadata from image, returning the cleaned PNG as base64.
+
+    Profiles that keep uploads (full) also save the cleaned copy in
+    UPLOAD_FOLDER and name it in `cleaned_file`, as the full backend always has.
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file part'}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+
+        image_without_exif = copy_without_metadata(Image.open(file.stream))
+
+        output = BytesIO()
+        image_without_exif.save(output, format='PNG')
+
+        result = {
+            'status': 'success',
+            'message': 'Metadata removed successfully',
+            'file': base64.b64encode(output.getvalue()).decode()
+        }
+        if current_app.config['KEEP_UPLOADS']:
+            result['cleaned_file'] = 'cleaned_' + (secure_filename(file.filename) or 'image.png')
+            image_without_exif.save(os.path.join(current_app.config['UPLOAD_FOLDER'], result['cleaned_file']), quality=95)
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error stripping metadata: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/remove-exif', methods=['POST'])
+@metrics.track_request('remove_exif')
+@admission.limit('cheap')
+def remove_exif():
+    """Remove EXIF data from image and return as file download"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file part'}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+
+        image_without_exif = copy_without_metadata(Image.open(file.stream))
+
+        # Use JPEG format for compatibility and smaller size
+        if image_without_exif.mode not in ('RGB', 'L'):
+            image_without_exif = image_without_exif.convert('RGB')
+        output = BytesIO()
+        image_without_exif.save(output, format='JPEG', quality=95, optimize=False)
+        output.seek(0)
+
+        return send_file(
+            output,
+            mimetype='image/jpeg',
+            as_attachment=True,
+            download_name='image_no_exif.jpg'
+        )
+
+    except Exception as e:
+        print(f"Error removing EXIF: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/health', methods=['GET'])
+def health():
+    """Liveness plus the profile's engines, resident models, RSS and recent model load/unload events"""
+    profile = engines.active_profile()
+    return jsonify({
+        'status': 'ok',
+        'service': profile['service'],
+        'profile': profile['name'],
+        'engines': engines.describe(),
+        'models': models.describe(),
+        'admission': admission.describe(),
+        'results_store': store.describe(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latencies, in-flight work, model loads and cache hit rates in Prometheus text format"""
+    return metrics.metrics_response()
+
+def warm_up_models():
+    """Load the profile's models ahead of the first request that needs them"""
+    print("[INFO] Warming up models in the background...")
+    engines.warm_up()
+    print("[INFO] Model warm-up finished")
+
+def start_warmup():
+    """Start background warm-up; /health keeps answering while models load"""
+    threading.Thread(target=warm_up_models, name='model-warmup', daemon=True).start()
+
+def create_app(profile_name=None):
+    """Build the API for a deployment profile ('full' or 'lite'; defaults to ASTRA_PROFILE)"""
+    profile = engines.configure(profile_name or settings['PROFILE'])
+
+    app = Flask(__name__)
+    CORS(app)
+    app.config.update(settings)
+    app.config['PROFILE'] = profile['name']
+    app.config['KEEP_UPLOADS'] = profile['keep_uploads']
+    thumbnails.init_app(app)
+    app.register_blueprint(api)
+    if multiprocessing.current_process().name != 'MainProcess':
+        # A spawned worker (video segments, scans) re-importing the launching script: the
+        # parent process already runs the store writer, model reaper and upload sweeps
+        return app
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    uploads.sweep_expired()
+    store.init()
+    admission.configure()
+    models.start_reaper()
+
+    selected = ', '.join(f"{stage}={engines.engine_name(stage)}" for stage in engines.STAGE_PRIORITY if engines.enabled(stage))
+    print(f"[INFO] Profile '{profile['name']}': {selected or 'no model engines'}")
+    return app
@@ -0,0 +1,340 @@
+"""
+Persistent results store (SQLite)
+Each analyzed image or video is summarized into one indexed row: hashes, camera,
+capture time, GPS, object classes, face/plate counts and risk. Requests only enqueue
+the summary; a background writer inserts queued rows in batched transactions.
+Coordinates are also kept in an R*Tree, so radius and bounding-box lookups only visit
+the matching region.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from . import geo
+from . import metrics
+from .config import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    filename TEXT,
+    sha256 TEXT,
+    image_hash TEXT,
+    analyzed_at REAL NOT NULL,
+    camera_make TEXT COLLATE NOCASE,
+    camera_model TEXT COLLATE NOCASE,
+    captured_at TEXT,
+    latitude REAL,
+    longitude REAL,
+    has_gps INTEGER NOT NULL DEFAULT 0,
+    face_count INTEGER NOT NULL DEFAULT 0,
+    plate_count INTEGER NOT NULL DEFAULT 0,
+    object_count INTEGER NOT NULL DEFAULT 0,
+    risk_level TEXT,
+    risk_score INTEGER
+);
+CREATE TABLE IF NOT EXISTS item_objects (
+    item_id INTEGER NOT NULL REFERENCES items(id) ON DELETE CASCADE,
+    class TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (class, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS items_analyzed ON items(analyzed_at);
+CREATE INDEX IF NOT EXISTS items_camera ON items(camera_make, camera_model, analyzed_at);
+CREATE INDEX IF NOT EXISTS items_captured ON items(captured_at);
+CREATE INDEX IF NOT EXISTS items_sha256 ON items(sha256);
+CREATE INDEX IF NOT EXISTS items_risk ON items(risk_level, analyzed_at);
+CREATE INDEX IF NOT EXISTS items_faces ON items(analyzed_at) WHERE face_count > 0;
+CREATE INDEX IF NOT EXISTS items_plates ON items(analyzed_at) WHERE plate_count > 0;
+"""
+
+# Point boxes per located item; without the R*Tree module, a plain index on the columns
+SPATIAL_SCHEMA = 'CREATE VIRTUAL TABLE IF NOT EXISTS item_locations USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+FALLBACK_SPATIAL_SCHEMA = 'CREATE INDEX IF NOT EXISTS items_location ON items(latitude, longitude) WHERE latitude IS NOT NULL'
+
+COLUMNS = ['kind', 'filename', 'sha256', 'image_hash', 'analyzed_at', 'camera_make', 'camera_model', 'captured_at',
+           'latitude', 'longitude', 'has_gps', 'face_count', 'plate_count', 'object_count', 'risk_level', 'risk_score']
+
+_queue = None
+_writer = None
+_start_lock = threading.Lock()
+_local = threading.local()
+_rtree = True
+
+def enabled():
+    return bool(settings['RESULTS_DB'])
+
+def connect():
+    connection = sqlite3.connect(settings['RESULTS_DB'], timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')  # readers don't block the writer
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('PRAGMA foreign_keys=ON')
+    connection.create_function('distance_m', 4, geo.haversine_m, deterministic=True)
+    return connection
+
+def _create_spatial_index(connection):
+    """Create the R*Tree, filling it from items stored before it existed; False if SQLite lacks R*Tree"""
+    exists = connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'item_locations'").fetchone()
+    try:
+        with connection:
+            connection.execute(SPATIAL_SCHEMA)
+            if not exists:
+                connection.execute('INSERT INTO item_locations SELECT id, latitude, latitude, longitude, longitude '
+                                   'FROM items WHERE latitude IS NOT NULL AND longitude IS NOT NULL')
+        return True
+    except sqlite3.OperationalError as e:
+        print(f"[WARNING] SQLite R*Tree unavailable ({e}); location queries use a plain index")
+        connection.execute(FALLBACK_SPATIAL_SCHEMA)
+        return False
+
+def create_schema():
+    """Create the database and its tables if needed; returns a connection for direct writes"""
+    global _rtree
+    directory = os.path.dirname(settings['RESULTS_DB'])
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = connect()
+    connection.executescript(SCHEMA)
+    _rtree = _create_spatial_index(connection)
+    return connection
+
+def init():
+    """Create the schema and start the background writer once per process"""
+    global _queue, _writer
+    if not enabled():
+        return
+    with _start_lock:
+        if _writer is not None:
+            return
+        create_schema().close()
+        _queue = queue.Queue(maxsize=settings['RESULTS_QUEUE'])
+        _writer = threading.Thread(target=_write_loop, name='results-writer', daemon=True)
+        _writer.start()
+
+def record(item):
+    """Queue a summarized result for insertion; never blocks the request"""
+    if _queue is None:
+        return
+    try:
+        _queue.put_nowait(item)
+    except queue.Full:
+        metrics.stage_errors.inc(stage='results_store_dropped')
+        print("[WARNING] Results store queue is full; dropping a result")
+
+def _write_loop():
+    connection = connect()
+    while True:
+        batch = [_queue.get()]
+        # Collect what else is queued, briefly, so bursts share one transaction
+        deadline = time.time() + 0.5
+        while len(batch) < settings['RESULTS_BATCH']:
+            try:
+                batch.append(_queue.get(timeout=max(0.0, deadline - time.time())))
+            except queue.Empty:
+                break
+        try:
+            with metrics.stage_timer('results_store_write'), connection:
+                insert_items(connection, batch)
+        except Exception as e:
+            print(f"Error writing {len(batch)} results: {e}")
+
+def insert_items(connection, items):
+    """Insert summarized items and their object classes; the caller owns the transaction"""
+    placeholders = ', '.join('?' for _ in COLUMNS)
+    for item in items:
+        cursor = connection.execute(f"INSERT INTO items ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                                    [item.get(column) for column in COLUMNS])
+        connection.executemany('INSERT INTO item_objects (item_id, class, count) VALUES (?, ?, ?)',
+                               [(cursor.lastrowid, name, count) for name, count in item['objects'].items()])
+        if _rtree and item.get('latitude') is not None and item.get('longitude') is not None:
+            connection.execute('INSERT INTO item_locations VALUES (?, ?, ?, ?, ?)',
+                               (cursor.lastrowid, item['latitude'], item['latitude'], item['longitude'], item['longitude']))
+
+def _exif_datetime(value):
+    """'YYYY:MM:DD HH:MM:SS' to ISO 8601, so captured_at sorts and compares as text"""
+    try:
+        return datetime.strptime(str(value).strip(), '%Y:%m:%d %H:%M:%S').isoformat()
+    except (TypeError, ValueError):
+        return None
+
+def _coordinate(gps_data, key):
+    value = (gps_data or {}).get(key)
+    return float(value) if isinstance(value, (int, float)) else None
+
+def _summary(kind, file_info, camera_info, gps_data, objects, face_count, plate_count, privacy_risk, image_hash=None):
+    camera_info = camera_info or {}
+    make, model = (str(camera_info[key]).strip() if camera_info.get(key) else None for key in ('make', 'model'))
+    return {
+        'kind': kind,
+        'filename': file_info.get('filename'),
+        'sha256': file_info.get('sha256'),
+        'image_hash': image_hash,
+        'analyzed_at': time.time(),
+        'camera_make': make,
+        'camera_model': model,
+        'captured_at': _exif_datetime((camera_info.get('capture_settings') or {}).get('datetime')),
+        'latitude': _coordinate(gps_data, 'latitude'),
+        'longitude': _coordinate(gps_data, 'longitude'),
+        'has_gps': int(bool(gps_data)),
+        'face_count': face_count,
+        'plate_count': plate_count,
+        'object_count': sum(objects.values()),
+        'risk_level': privacy_risk.get('level'),
+        'risk_score': privacy_risk.get('score'),
+        'objects': dict(objects)
+    }
+
+def image_summary(result):
+    """Store row for an analyze-image response"""
+    landmarks = result.get('landmarks_detected') or {}
+    objects = Counter(obj['class'] for obj in result.get('objects_detected') or [])
+    return _summary('image', result['file_info'], result.get('camera_info'), result.get('gps_data'), objects,
+                    landmarks.get('face_count', 0), 0, result['privacy_risk'], image_hash=result.get('image_hash'))
+
+def video_summary(file_info, privacy_risk, frame_analysis=None, dense_analysis=None):
+    """Store row for an analyzed video: unique tracked counts in dense mode, else per-frame maxima"""
+    if dense_analysis is not None:
+        counts = dense_analysis['unique_counts']
+        objects = Counter({name: count for name, count in counts.items() if name not in ('face', 'license_plate')})
+        return _summary('video', file_info, None, None, objects, counts.get('face', 0), counts.get('license_plate', 0),
+                        privacy_risk)
+
+    # The most of each class seen in one frame; summing frames would count the same object repeatedly
+    objects = Counter()
+    for analysis in frame_analysis or []:
+        for name, count in Counter(obj['class'] for obj in analysis['objects']).items():
+            objects[name] = max(objects[name], count)
+    return _summary('video', file_info, None, None, objects, privacy_risk.get('face_count', 0),
+                    privacy_risk.get('license_plates_count', 0), privacy_risk)
+
+# Query filters: name -> (SQL condition, value converter)
+FILTERS = {
+    'kind': ('items.kind = ?', str),
+    'sha256': ('items.sha256 = ?', str.lower),
+    'camera_make': ('items.camera_make = ?', str),
+    'camera_model': ('items.camera_model = ?', str),
+    'risk_level': ('items.risk_level = ?', str.upper),
+    'min_faces': ('items.face_count >= ?', int),
+    'min_plates': ('items.plate_count >= ?', int),
+    'captured_after': ('items.captured_at >= ?', str),
+    'captured_before': ('items.captured_at < ?', str),
+    'since': ('items.analyzed_at >= ?', lambda value: datetime.fromisoformat(value).timestamp()),
+    'since_days': ('items.analyzed_at >= ?', lambda value: time.time() - float(value) * 86400),
+    'object': ('EXISTS (SELECT 1 FROM item_objects o WHERE o.class = ? AND o.item_id = items.id)', str),
+}
+FLAGS = {
+    'has_faces': 'items.face_count > 0',
+    'has_plates': 'items.plate_count > 0',
+    'has_gps': 'items.has_gps = 1',
+}
+
+def _reader():
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        connection = _local.connection = connect()
+    return connection
+
+def _conditions(params, before_id=None):
+    """SQL conditions and values for FILTERS / FLAGS in `params`; raises ValueError for bad values"""
+    conditions = []
+    values = []
+    for name, value in params.items():
+        if name in FILTERS and value not in (None, ''):
+            condition, convert = FILTERS[name]
+            try:
+                values.append(convert(value))
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid value for {name}: {value!r}")
+            conditions.append(condition)
+        elif name in FLAGS and value in ('1', 'true'):
+            conditions.append(FLAGS[name])
+    if before_id is not None:
+        conditions.append('items.id < ?')
+        values.append(before_id)
+    return conditions, values
+
+SELECT_ITEMS = ('SELECT items.*, (SELECT json_group_object(class, count) FROM item_objects '
+                'WHERE item_id = items.id) AS objects')
+
+def _fetch(sql, values):
+    with metrics.stage_timer('results_store_query'):
+        rows = _reader().execute(sql, values).fetchall()
+    items = []
+    for row in rows:
+        item = dict(row)
+        item['objects'] = json.loads(item['objects'] or '{}')
+        item['analyzed_at'] = datetime.fromtimestamp(item['analyzed_at']).isoformat()
+        items.append(item)
+    return items
+
+def query(params, limit=100, before_id=None):
+    """Filtered lookup, newest first; raises ValueError for bad filter values.
+
+    `params` maps FILTERS / FLAGS names to request values. Pages continue
+    from `before_id` (the last id of the previous page).
+    """
+    conditions, values = _conditions(params, before_id)
+    sql = (SELECT_ITEMS + ' FROM items' + (' WHERE ' + ' AND '.join(conditions) if conditions else '') +
+           ' ORDER BY items.id DESC LIMIT ?')
+    return _fetch(sql, values + [limit])
+
+def _query_boxes(boxes, conditions, values, limit, center=None, radius_m=None):
+    """Items inside any of `boxes`; with a center, within radius_m of it and nearest first"""
+    items = []
+    for min_lat, min_lon, max_lat, max_lon in boxes:
+        if _rtree:
+            # CROSS JOIN keeps the R*Tree as the outer loop, so only the region's entries are read
+            source = 'FROM item_locations loc CROSS JOIN items ON items.id = loc.id'
+            box = ['loc.max_lat >= ?', 'loc.min_lat <= ?', 'loc.max_lon >= ?', 'loc.min_lon <= ?']
+            box_values = [min_lat, max_lat, min_lon, max_lon]
+        else:
+            source = 'FROM items'
+            box = ['items.latitude BETWEEN ? AND ?', 'items.longitude BETWEEN ? AND ?']
+            box_values = [min_lat, max_lat, min_lon, max_lon]
+        select = SELECT_ITEMS
+        select_values = []
+        where = box + conditions
+        where_values = box_values + values
+        if center is not None:
+            select += ', distance_m(items.latitude, items.longitude, ?, ?) AS distance_m'
+            select_values = list(center)
+            where.append('distance_m <= ?')
+            where_values.append(radius_m)
+            order = 'distance_m'
+        else:
+            order = 'items.id DESC'
+        sql = f"{select} {source} WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?"
+        items.extend(_fetch(sql, select_values + where_values + [limit]))
+
+    if center is not None:
+        items.sort(key=lambda item: item['distance_m'])
+        for item in items:
+            item['distance_m'] = round(item['distance_m'], 1)
+    else:
+        items.sort(key=lambda item: item['id'], reverse=True)
+    return items[:limit]
+
+def query_nearby(lat, lon, radius_m, params, limit=100):
+    """Located items within `radius_m` metres of (lat, lon), nearest first, with FILTERS / FLAGS applied"""
+    conditions, values = _conditions(params)
+    return _query_boxes(geo.radius_boxes(lat, lon, radius_m), conditions, values, limit,
+                        center=(lat, lon), radius_m=radius_m)
+
+def query_box(min_lat, min_lon, max_lat, max_lon, params, limit=100, before_id=None):
+    """Located items inside a bounding box, newest first; min_lon > max_lon crosses the antimeridian"""
+    conditions, values = _conditions(params, before_id)
+    return _query_boxes(geo.split_box(min_lat, min_lon, max_lat, max_lon), conditions, values, limit)
+
+def describe():
+    """Queue depth for /health"""
+    if _queue is None:
+        return {'enabled': False}
+    return {'enabled': True, 'path': settings['RESULTS_DB'], 'queued': _queue.qsize()}
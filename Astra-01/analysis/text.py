@@ -0,0 +1,207 @@
+"""
+Text analysis: named entities (spaCy), sentiment (TextBlob), contact details and web context
+spacy, textblob, wikipedia and bs4 are imported on first use
+"""
+
+import re
+import threading
+import time
+
+import requests
+
+from . import engines
+from . import metrics
+from . import models
+
+nlp_model = None
+nlp_lock = threading.Lock()
+
+@metrics.timed('web_search_ddg')
+def search_ddg_html(query, max_results=5):
+    """Search DuckDuckGo HTML version (Scraper)"""
+    try:
+        url = "https://html.duckduckgo.com/html/"
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        }
+        data = {
+            "q": query
+        }
+
+        resp = requests.post(url, data=data, headers=headers, timeout=10)
+        results = []
+
+        if resp.status_code == 200:
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(resp.text, 'html.parser')
+            result_divs = soup.find_all('div', class_='result')
+
+            for res in result_divs[:max_results]:
+                try:
+                    title_tag = res.find('a', class_='result__a')
+                    snippet_tag = res.find('a', class_='result__snippet')
+
+                    if title_tag and snippet_tag:
+                        results.append({
+                            'title': title_tag.text,
+                            'href': title_tag['href'],
+                            'body': snippet_tag.text
+                        })
+                except Exception:
+                    continue
+
+        return results
+    except Exception as e:
+        print(f"Error searching DDG: {e}")
+        return []
+
+@metrics.timed('web_search')
+def search_web(query, max_results=3):
+    """Search the web using DuckDuckGo (Primary) or Wikipedia (Fallback)"""
+    try:
+        # Try DuckDuckGo first (Broad Web Search)
+        print(f"Searching DuckDuckGo for: {query}")
+        ddg_results = search_ddg_html(query, max_results)
+
+        if ddg_results:
+            return ddg_results
+
+        # Fallback to Wikipedia
+        print(f"DuckDuckGo failed/empty. Falling back to Wikipedia for: {query}")
+        import wikipedia
+        results = []
+        # Search for titles
+        search_results = wikipedia.search(query, results=max_results)
+
+        for title in search_results:
+            try:
+                # Get page summary
+                # auto_suggest=False prevents random redirects
+                summary = wikipedia.summary(title, sentences=2, auto_suggest=False)
+                url = wikipedia.page(title, auto_suggest=False).url
+
+                results.append({
+                    'title': title,
+                    'href': url,
+                    'body': summary
+                })
+            except Exception as e:
+                print(f"Error fetching page {title}: {e}")
+                continue
+
+        return results
+    except Exception as e:
+        print(f"Error searching web: {e}")
+        return []
+
+def get_nlp_model():
+    """Lazy load Spacy model (again after the lifecycle manager unloads it)"""
+    global nlp_model
+    nlp = nlp_model
+    if nlp is not None:
+        return nlp
+    with nlp_lock:
+        nlp = nlp_model
+        if nlp is not None:
+            return nlp
+        try:
+            print("[INFO] Loading Spacy model...")
+            rss_before = models.rss_mb()
+            load_start = time.perf_counter()
+            import spacy
+            nlp = nlp_model = spacy.load("en_core_web_sm")
+            metrics.record_model_load('spacy', time.perf_counter() - load_start)
+            print("[INFO] Spacy model loaded successfully")
+        except Exception as e:
+            print(f"[WARNING] Could not load Spacy model: {e}")
+            return None
+    # Registered outside nlp_lock: registering may unload other models
+    models.loaded('spacy', unload_nlp_model, rss_before_mb=rss_before)
+    return nlp
+
+def unload_nlp_model():
+    global nlp_model
+    with nlp_lock:
+        nlp_model = None
+
+def analyze_text_content(text):
+    """Analyze text for entities, sentiment, and risks"""
+    try:
+        nlp = get_nlp_model()
+        if nlp is None:
+            return None
+
+        with metrics.stage_timer('spacy_nlp'), models.in_use('spacy'):
+            doc = nlp(text)
+        from textblob import TextBlob
+        blob = TextBlob(text)
+
+        # Entities
+        entities = {
+            'PERSON': [],
+            'ORG': [],
+            'GPE': [], # Locations
+            'LOC': [], # Locations
+            'DATE': [],
+            'MONEY': []
+        }
+
+        for ent in doc.ents:
+            if ent.label_ in entities:
+                entities[ent.label_].append(ent.text)
+
+        # Regex extraction
+        emails = re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text)
+        phones = re.findall(r'\+?[\d\s-]{10,}', text) # Simple phone regex
+        urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)
+        socials = re.findall(r'@[\w_]+', text)
+
+        # Sentiment
+        sentiment = {
+            'polarity': blob.sentiment.polarity,
+            'subjectivity': blob.sentiment.subjectivity,
+            'label': 'Positive' if blob.sentiment.polarity > 0.1 else 'Negative' if blob.sentiment.polarity < -0.1 else 'Neutral'
+        }
+
+        # Risk Assessment
+        risks = []
+        if emails: risks.append(f"Found {len(emails)} email addresses")
+        if phones: risks.append(f"Found {len(phones)} phone numbers")
+        if entities['GPE'] or entities['LOC']: risks.append(f"Found {len(entities['GPE']) + len(entities['LOC'])} location references")
+
+        risk_score = min(100, (len(emails) * 20) + (len(phones) * 20) + (len(entities['GPE']) * 10))
+
+        # Web Search for Context
+        search_query = ""
+        if entities['PERSON']:
+            search_query += " ".join(entities['PERSON'][:2]) + " "
+        if entities['ORG']:
+            search_query += " ".join(entities['ORG'][:1]) + " "
+        if entities['GPE']:
+            search_query += " ".join(entities['GPE'][:1])
+
+        if not search_query.strip():
+            # Fallback to key noun phrases if no entities found
+            search_query = " ".join(blob.noun_phrases[:3])
+
+        if not search_query.strip():
+             search_query = text[:50] # Last resort
+
+        web_results = search_web(search_query.strip())
+
+        return {
+            'entities': entities,
+            'emails': emails,
+            'phones': phones,
+            'urls': urls,
+            'socials': socials,
+            'sentiment': sentiment,
+            'risks': risks,
+            'risk_score': risk_score,
+            'web_results': web_results
+        }
+    except Exception as e:
+        print(f"Error analyzing text: {e}")
+        return None
+
+engines.register_engine('text_nlp', 'spacy', analyze_text_content, memory_mb=150, cpu_cost=1, load=get_nlp_model)
@@ -0,0 +1,119 @@
+"""
+Content-addressed thumbnail store for extracted video frames
+Frames are encoded once per configured size, served by URL with ETag/Cache-Control and expire after a TTL
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+import cv2
+from flask import abort, send_file, url_for
+
+from . import metrics
+from .config import settings
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{40}\.jpg$')
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+def init_app(app):
+    """Create the thumbnail folder and register the /thumbnails/<key> route"""
+    os.makedirs(settings['THUMBNAIL_FOLDER'], exist_ok=True)
+    app.add_url_rule('/thumbnails/<key>', 'thumbnail', serve_thumbnail, methods=['GET'])
+
+def _resize(frame, max_side):
+    h, w = frame.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return frame
+    scale = max_side / float(max(h, w))
+    return cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+def _write_once(folder, data):
+    """Store encoded bytes under their content hash; an existing copy just gets its TTL refreshed"""
+    key = hashlib.sha1(data).hexdigest() + '.jpg'
+    path = os.path.join(folder, key)
+    if os.path.exists(path):
+        os.utime(path)
+        metrics.record_cache('thumbnail', True)
+        return key
+    metrics.record_cache('thumbnail', False)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return key
+
+def sweep_expired(force=False):
+    """Delete thumbnails older than the TTL; runs at most once a minute unless forced"""
+    global _last_sweep
+    now = time.time()
+    with _sweep_lock:
+        if not force and now - _last_sweep < 60:
+            return
+        _last_sweep = now
+    folder = settings['THUMBNAIL_FOLDER']
+    ttl = settings['THUMBNAIL_TTL_SECONDS']
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if now - os.path.getmtime(path) > ttl:
+                os.remove(path)
+        except OSError:
+            pass
+
+def write_frame(frame, folder, sizes, quality):
+    """Write a BGR frame at each size without needing an app context; returns {size_label: key}.
+
+    Size labels are the max side in pixels, or 'full' for the original.
+    """
+    keys = {}
+    for max_side in sizes:
+        ret, buffer = cv2.imencode('.jpg', _resize(frame, max_side), [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ret:
+            continue
+        keys[str(max_side) if max_side else 'full'] = _write_once(folder, buffer.tobytes())
+    return keys
+
+def store_options():
+    """Folder, sizes and quality from the settings, for write_frame in worker processes"""
+    return {'folder': settings['THUMBNAIL_FOLDER'], 'sizes': settings['THUMBNAIL_SIZES'],
+            'quality': settings['THUMBNAIL_JPEG_QUALITY']}
+
+def key_urls(keys):
+    """{size_label: key} to {size_label: url}"""
+    return {label: url_for('thumbnail', key=key, _external=True) for label, key in keys.items()}
+
+@metrics.timed('thumbnail_store')
+def store_frame(frame):
+    """Write a BGR frame at every configured size; returns {size_label: url}"""
+    urls = key_urls(write_frame(frame, **store_options()))
+    sweep_expired()
+    return urls
+
+def primary_url(urls):
+    """The largest stored size, used where a single image URL is expected"""
+    if 'full' in urls:
+        return urls['full']
+    return urls[max(urls, key=int)] if urls else None
+
+def serve_thumbnail(key):
+    if not KEY_PATTERN.match(key):
+        abort(404)
+    path = os.path.join(settings['THUMBNAIL_FOLDER'], key)
+    ttl = settings['THUMBNAIL_TTL_SECONDS']
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        abort(404)
+    if age > ttl:
+        abort(404)
+    # Content-addressed, so the key is a strong ETag and the bytes never change
+    response = send_file(os.path.abspath(path), mimetype='image/jpeg', etag=key[:-4], conditional=True,
+                         max_age=max(0, int(ttl - age)))
+    response.headers['Cache-Control'] = f'public, max-age={max(0, int(ttl - age))}, immutable'
+    return response
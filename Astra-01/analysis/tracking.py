@@ -0,0 +1,264 @@
+"""
+Dense video analysis: detectors on keyframes, tracking in between
+Every processed frame moves the open tracks by sparse optical flow; every Nth one is a
+keyframe whose detections are matched to the tracks by IoU. Each object is counted
+once, with the time span it was tracked over, once it has been detected on more than
+one keyframe; single-keyframe detections are left out as likely false positives.
+"""
+
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from . import engines
+from . import metrics
+from .config import settings
+from .vision import detect_face_boxes, detect_objects
+
+TRACK_MIN_CONFIDENCE = 0.4
+FLOW_MAX_SIDE = 480  # optical flow runs on a downscaled grayscale frame
+MIN_TRACK_POINTS = 4
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def polygon_box(points):
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+class Track:
+    """One object followed across frames"""
+
+    def __init__(self, track_id, detection, frame_number, timestamp):
+        self.track_id = track_id
+        self.label = detection['label']
+        self.bbox = list(detection['bbox'])
+        self.first_frame = self.last_frame = frame_number
+        self.start_time = self.end_time = timestamp
+        self.hits = 1
+        self.missed = 0
+        self.max_confidence = detection['confidence']
+        self.texts = Counter([detection['text']] if detection.get('text') else [])
+        self.points = None  # flow points in downscaled coordinates
+
+    def update(self, detection, frame_number, timestamp):
+        self.bbox = list(detection['bbox'])
+        self.hits += 1
+        self.missed = 0
+        self.max_confidence = max(self.max_confidence, detection['confidence'])
+        if detection.get('text'):
+            self.texts[detection['text']] += 1
+        self.extend(frame_number, timestamp)
+
+    def extend(self, frame_number, timestamp):
+        self.last_frame = frame_number
+        self.end_time = timestamp
+
+    def describe(self):
+        track = {
+            'track_id': self.track_id,
+            'class': self.label,
+            'first_frame': self.first_frame,
+            'last_frame': self.last_frame,
+            'start_time': round(self.start_time, 3),
+            'end_time': round(self.end_time, 3),
+            'keyframe_hits': self.hits,
+            'max_confidence': round(self.max_confidence, 3)
+        }
+        if self.texts:
+            track['text'] = self.texts.most_common(1)[0][0]
+        return track
+
+def keyframe_detections(frame, langs=None):
+    """Objects, faces and plates on a keyframe as [{'label', 'bbox', 'confidence', 'text'?}]"""
+    objects = detect_objects(frame)
+    detections = [{'label': obj['class'], 'bbox': obj['bbox'], 'confidence': obj['confidence']}
+                  for obj in objects if obj['confidence'] >= TRACK_MIN_CONFIDENCE]
+
+    if engines.enabled('face'):
+        try:
+            for face in detect_face_boxes(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)):
+                detections.append({'label': 'face', **face})
+        except Exception as e:
+            print(f"Error in face detection: {e}")
+
+    if engines.enabled('plates') and settings['PLATE_DETECTION'] == 'stage':
+        for plate in engines.run('plates', frame, objects=objects, langs=langs):
+            detections.append({'label': 'license_plate', 'bbox': polygon_box(plate['bbox']),
+                               'confidence': plate['confidence'], 'text': plate['text']})
+    return detections
+
+def associate(tracks, detections, threshold):
+    """Greedily pair tracks with same-label detections, highest IoU first; returns (pairs, unmatched detections)"""
+    candidates = sorted(((iou(track.bbox, detection['bbox']), t, d)
+                         for t, track in enumerate(tracks)
+                         for d, detection in enumerate(detections)
+                         if track.label == detection['label']), reverse=True)
+    used_tracks = set()
+    used_detections = set()
+    pairs = []
+    for overlap, t, d in candidates:
+        if overlap < threshold:
+            break
+        if t in used_tracks or d in used_detections:
+            continue
+        used_tracks.add(t)
+        used_detections.add(d)
+        pairs.append((tracks[t], detections[d]))
+    return pairs, [detection for d, detection in enumerate(detections) if d not in used_detections]
+
+def seed_points(track, gray, scale):
+    """Corner features inside a track's box, in downscaled coordinates"""
+    h, w = gray.shape[:2]
+    x1, y1, x2, y2 = [int(round(v * scale)) for v in track.bbox]
+    x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+    if x2 - x1 < 4 or y2 - y1 < 4:
+        return None
+    mask = np.zeros_like(gray)
+    mask[y1:y2, x1:x2] = 255
+    return cv2.goodFeaturesToTrack(gray, maxCorners=20, qualityLevel=0.01, minDistance=3, mask=mask)
+
+def propagate(tracks, prev_gray, gray, scale):
+    """Shift each track's box by the median optical flow of its points; returns the tracks that moved.
+
+    Tracks whose points are lost keep their box until the next keyframe.
+    """
+    owners = []
+    points = []
+    for track in tracks:
+        if track.points is None or len(track.points) < MIN_TRACK_POINTS:
+            track.points = seed_points(track, prev_gray, scale)
+        if track.points is not None and len(track.points) >= MIN_TRACK_POINTS:
+            owners.extend([track] * len(track.points))
+            points.append(track.points)
+    if not points:
+        return []
+
+    with metrics.stage_timer('optical_flow'):
+        previous = np.concatenate(points).astype(np.float32)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, previous, None, winSize=(15, 15), maxLevel=2)
+
+    flows = {}
+    for track, start, end, ok in zip(owners, previous, moved, status.ravel()):
+        if ok:
+            flows.setdefault(track.track_id, (track, [], []))
+            flows[track.track_id][1].append(end - start)
+            flows[track.track_id][2].append(end)
+
+    propagated = []
+    for track in tracks:
+        if track.track_id not in flows or len(flows[track.track_id][1]) < MIN_TRACK_POINTS:
+            track.points = None
+            continue
+        _, displacements, new_points = flows[track.track_id]
+        dx, dy = np.median(np.array(displacements).reshape(-1, 2), axis=0) / scale
+        track.bbox = [track.bbox[0] + dx, track.bbox[1] + dy, track.bbox[2] + dx, track.bbox[3] + dy]
+        track.points = np.array(new_points, dtype=np.float32).reshape(-1, 1, 2)
+        propagated.append(track)
+    return propagated
+
+def flow_frame(frame):
+    """Downscaled grayscale frame for optical flow, and the scale applied"""
+    h, w = frame.shape[:2]
+    scale = min(1.0, FLOW_MAX_SIDE / float(max(h, w)))
+    if scale < 1.0:
+        frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), scale
+
+def unique_counts(tracks):
+    """Tracked identities per class; plates with the same text count once"""
+    counts = Counter(track['class'] for track in tracks if track['class'] != 'license_plate')
+    plates = [track for track in tracks if track['class'] == 'license_plate']
+    plate_count = len({track['text'] for track in plates if track.get('text')})
+    plate_count += sum(1 for track in plates if not track.get('text'))
+    if plate_count:
+        counts['license_plate'] = plate_count
+    return dict(counts)
+
+@metrics.timed('dense_video')
+def analyze_dense(video_path, detect_every=None, fps=None, langs=None):
+    """Decode frames at `fps`, run detectors on every `detect_every`th one and track in between.
+
+    Returns unique tracks with their time spans and per-class identity counts.
+    Tracks need VIDEO_TRACK_MIN_HITS keyframe detections (or every keyframe,
+    in a video with fewer) to be reported. Processing stops after
+    VIDEO_DENSE_MAX_FRAMES frames and the result is marked truncated.
+    """
+    detect_every = max(1, detect_every or settings['VIDEO_DETECT_EVERY'])
+    max_frames = settings['VIDEO_DENSE_MAX_FRAMES']
+    truncated = False
+    cap = cv2.VideoCapture(video_path)
+    try:
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        stride = max(1, int(round(video_fps / (fps or settings['VIDEO_DENSE_FPS'])))) if video_fps > 0 else 1
+
+        active = []
+        finished = []
+        next_id = 1
+        frame_number = 0
+        processed = 0
+        keyframes = 0
+        prev_gray = None
+        while True:
+            if processed >= max_frames:
+                truncated = cap.grab()
+                break
+            if frame_number % stride:
+                if not cap.grab():
+                    break
+                frame_number += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp = frame_number / video_fps if video_fps > 0 else 0
+            gray, scale = flow_frame(frame)
+
+            if prev_gray is not None and active:
+                for track in propagate(active, prev_gray, gray, scale):
+                    if not track.missed:
+                        track.extend(frame_number, timestamp)
+
+            if processed % detect_every == 0:
+                keyframes += 1
+                pairs, unmatched = associate(active, keyframe_detections(frame, langs), settings['VIDEO_TRACK_IOU'])
+                matched = set()
+                for track, detection in pairs:
+                    track.update(detection, frame_number, timestamp)
+                    track.points = None  # reseed on the corrected box
+                    matched.add(track.track_id)
+                still_active = []
+                for track in active:
+                    if track.track_id not in matched:
+                        track.missed += 1
+                    (finished if track.missed > settings['VIDEO_TRACK_MAX_MISSED'] else still_active).append(track)
+                active = still_active
+                for detection in unmatched:
+                    active.append(Track(next_id, detection, frame_number, timestamp))
+                    next_id += 1
+
+            prev_gray = gray
+            processed += 1
+            frame_number += 1
+    finally:
+        cap.release()
+
+    min_hits = min(settings['VIDEO_TRACK_MIN_HITS'], keyframes)
+    confirmed = [track for track in finished + active if track.hits >= min_hits]
+    tracks = sorted((track.describe() for track in confirmed), key=lambda track: (track['first_frame'], track['track_id']))
+    return {
+        'frame_stride': stride,
+        'keyframe_interval': detect_every,
+        'frames_processed': processed,
+        'keyframes': keyframes,
+        'truncated': truncated,
+        'unconfirmed_tracks': len(finished) + len(active) - len(confirmed),
+        'tracks': tracks,
+        'unique_counts': unique_counts(tracks)
+    }
@@ -0,0 +1,339 @@
+"""
+Resumable chunked uploads: init -> PUT chunks at offsets -> finalize
+Chunks are written straight into a partial file in UPLOAD_FOLDER, so nothing is
+spooled and copied again; the bytes on disk are the resume offset. Finalize checks
+the SHA-256 and moves the file into place for the analysis endpoints (upload_id=...).
+"""
+
+import hashlib
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+
+try:
+    import fcntl  # not on Windows
+except ImportError:
+    fcntl = None
+
+from . import metrics
+from .config import settings
+from .media import allowed_file, file_sha256
+
+ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+READ_BLOCK = 1024 * 1024
+
+# Running SHA-256 per upload while chunks arrive in order, so finalize needn't re-read
+# the file; process-local, so after a restart or on another worker finalize re-hashes
+_hashers = {}  # upload_id -> (offset, hasher)
+_hashers_lock = threading.Lock()
+
+# Per-upload chunk locks within this process; fcntl, where available, also covers other workers
+_chunk_locks = {}
+_chunk_locks_lock = threading.Lock()
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+def incoming_folder():
+    return os.path.join(settings['UPLOAD_FOLDER'], '.incoming')
+
+def _paths(upload_id):
+    if not ID_PATTERN.match(upload_id or ''):
+        raise UploadError('Unknown upload', 404)
+    base = os.path.join(incoming_folder(), upload_id)
+    return base + '.json', base + '.part'
+
+def _load(upload_id):
+    record_path, _ = _paths(upload_id)
+    try:
+        with open(record_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise UploadError('Unknown upload', 404)
+
+def _save(record):
+    record_path, _ = _paths(record['upload_id'])
+    tmp_path = record_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(record, f)
+    os.replace(tmp_path, record_path)
+
+def _received(upload_id):
+    _, part_path = _paths(upload_id)
+    try:
+        return os.path.getsize(part_path)
+    except OSError:
+        return 0
+
+def _chunk_lock(upload_id):
+    with _chunk_locks_lock:
+        return _chunk_locks.setdefault(upload_id, threading.Lock())
+
+def _lock_part(f, upload_id):
+    """Take the upload's chunk lock without waiting; returns the lock taken, or None if it is held.
+
+    The caller releases that same lock object; the flock, where there is one,
+    goes with the file.
+    """
+    lock = _chunk_lock(upload_id)
+    if not lock.acquire(blocking=False):
+        return None
+    if fcntl is not None and f is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.release()
+            return None
+    return lock
+
+@contextmanager
+def _exclusive(upload_id):
+    """Hold the upload's chunk lock for finalize / discard; 409 while a chunk is being written.
+
+    The lock's entry is dropped once it is released: the upload is gone or
+    complete, and a writer that still holds the old lock re-checks the record.
+    """
+    _, part_path = _paths(upload_id)
+    f = None
+    if fcntl is not None:
+        try:
+            f = open(part_path, 'rb')  # for the flock other workers' writers take
+        except OSError:
+            pass  # already moved or removed; the thread lock still orders us with writers
+    try:
+        lock = _lock_part(f, upload_id)
+        if lock is None:
+            raise UploadError('A chunk for this upload is still being written', 409, _received(upload_id))
+        try:
+            yield
+        finally:
+            lock.release()
+        with _chunk_locks_lock:
+            if _chunk_locks.get(upload_id) is lock:
+                del _chunk_locks[upload_id]
+    finally:
+        if f is not None:
+            f.close()
+
+def describe(record):
+    """Client-facing upload state; `offset` is where the next chunk starts"""
+    state = {
+        'upload_id': record['upload_id'],
+        'filename': record['filename'],
+        'size': record['size'],
+        'status': record['status'],
+        'offset': record['size'] if record['status'] == 'complete' else _received(record['upload_id']),
+        'chunk_size': settings['UPLOAD_CHUNK_BYTES'],
+        'expires_at': record['created_at'] + settings['UPLOAD_TTL_SECONDS']
+    }
+    if record.get('sha256'):
+        state['sha256'] = record['sha256']
+    return state
+
+def create_upload(filename, size=None, sha256=None):
+    """Start an upload; `size` and `sha256` are optional here and may come at finalize"""
+    filename = secure_filename(filename or '')
+    if not filename or not allowed_file(filename):
+        raise UploadError('File type not allowed')
+    if size is not None and not 0 < size <= settings['UPLOAD_MAX_BYTES']:
+        raise UploadError(f"size must be between 1 and {settings['UPLOAD_MAX_BYTES']} bytes", 413)
+
+    sweep_expired()
+    os.makedirs(incoming_folder(), exist_ok=True)
+    upload_id = secrets.token_hex(16)
+    _, part_path = _paths(upload_id)
+    open(part_path, 'wb').close()
+    record = {
+        'upload_id': upload_id,
+        'filename': filename,
+        'size': size,
+        'expected_sha256': sha256.lower() if sha256 else None,
+        'status': 'receiving',
+        'created_at': time.time()
+    }
+    _save(record)
+    with _hashers_lock:
+        _hashers[upload_id] = (0, hashlib.sha256())
+    return record
+
+def get_upload(upload_id):
+    return _load(upload_id)
+
+@metrics.timed('upload_chunk')
+def write_chunk(upload_id, offset, stream, length=None):
+    """Append a request body at `offset`, which must equal the bytes received so far.
+
+    The body is read from the WSGI stream block by block straight into the
+    partial file. A dropped connection leaves the bytes that did arrive, and
+    the client resumes from the offset reported by get_upload.
+    """
+    record = _load(upload_id)
+    if record['status'] != 'receiving':
+        raise UploadError('Upload is already finalized', 409)
+    _, part_path = _paths(upload_id)
+
+    try:
+        f = open(part_path, 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload is already finalized', 409)
+    with f:
+        lock = _lock_part(f, upload_id)
+        if lock is None:
+            raise UploadError('Another chunk for this upload is in progress', 409, _received(upload_id))
+        try:
+            # Finalize or discard may have run between opening the file and taking the lock
+            if _load(upload_id)['status'] != 'receiving':
+                raise UploadError('Upload is already finalized', 409)
+            return _write_locked(upload_id, record, f, offset, stream, length)
+        finally:
+            lock.release()
+
+def _write_locked(upload_id, record, f, offset, stream, length):
+    """Body of write_chunk, under the upload's chunk lock"""
+    received = os.fstat(f.fileno()).st_size
+    if offset != received:
+        raise UploadError(f"Expected offset {received}", 409, received)
+    limit = record['size'] or settings['UPLOAD_MAX_BYTES']
+    if length is not None and received + length > limit:
+        raise UploadError('Chunk extends past the upload size', 413, received)
+
+    with _hashers_lock:
+        offset_hashed, hasher = _hashers.get(upload_id, (None, None))
+    if offset_hashed != received:
+        hasher = None  # chunks hashed elsewhere; finalize re-reads the file
+
+    f.seek(received)
+    written = 0
+    try:
+        while True:
+            block = stream.read(READ_BLOCK)
+            if not block:
+                break
+            if received + written + len(block) > limit:
+                raise UploadError('Chunk extends past the upload size', 413)
+            f.write(block)
+            if hasher is not None:
+                hasher.update(block)
+            written += len(block)
+    finally:
+        f.flush()
+        with _hashers_lock:
+            if hasher is not None:
+                _hashers[upload_id] = (received + written, hasher)
+            else:
+                _hashers.pop(upload_id, None)
+    return received + written
+
+@metrics.timed('upload_finalize')
+def finalize_upload(upload_id, sha256=None):
+    """Verify size and SHA-256, then move the file into UPLOAD_FOLDER under its final name.
+
+    Raises a 409 while a chunk is still being written.
+    """
+    record = _load(upload_id)
+    if record['status'] == 'complete':
+        return record
+    with _exclusive(upload_id):
+        return _finalize_locked(upload_id, sha256)
+
+def _finalize_locked(upload_id, sha256):
+    """Body of finalize_upload, under the upload's chunk lock"""
+    record = _load(upload_id)
+    if record['status'] == 'complete':
+        return record
+    _, part_path = _paths(upload_id)
+    received = _received(upload_id)
+    if record['size'] is not None and received != record['size']:
+        raise UploadError(f"Received {received} of {record['size']} bytes", 409, received)
+    if not received:
+        raise UploadError('No data received', 409, 0)
+
+    expected = (sha256 or record['expected_sha256'] or '').lower()
+    if not expected:
+        raise UploadError('sha256 is required')
+    with _hashers_lock:
+        offset_hashed, hasher = _hashers.pop(upload_id, (None, None))
+    digest = hasher.hexdigest() if offset_hashed == received else file_sha256(part_path)
+    if digest != expected:
+        _remove(upload_id)
+        raise UploadError('sha256 mismatch; the upload was discarded', 422)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
+    filepath = os.path.join(settings['UPLOAD_FOLDER'], timestamp + record['filename'])
+    os.replace(part_path, filepath)
+    record.update(status='complete', size=received, sha256=digest, filepath=filepath)
+    _save(record)
+    return record
+
+def data_path(upload_id):
+    """(path, bytes available, complete) of an upload's data, finalized or still arriving"""
+    record = _load(upload_id)
+    if record['status'] == 'complete':
+        return record['filepath'], record['size'], True
+    _, part_path = _paths(upload_id)
+    return part_path, _received(upload_id), False
+
+def claim_upload(upload_id):
+    """Hand a finalized upload to an analysis request; returns (filename, filepath, sha256).
+
+    Each upload is analyzed once; the file then follows the profile's
+    KEEP_UPLOADS rule like a direct upload.
+    """
+    record = _load(upload_id)
+    if record['status'] != 'complete':
+        raise UploadError('Upload is not finalized', 409)
+    record_path, _ = _paths(upload_id)
+    try:
+        os.remove(record_path)
+    except FileNotFoundError:
+        raise UploadError('Unknown upload', 404)  # claimed concurrently
+    return record['filename'], record['filepath'], record['sha256']
+
+def discard(upload_id):
+    """Delete an upload's partial file and record; raises a 409 while a chunk is being written"""
+    with _exclusive(upload_id):
+        _remove(upload_id)
+
+def _remove(upload_id):
+    for path in _paths(upload_id):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+
+def sweep_expired():
+    """Delete uploads started more than UPLOAD_TTL_SECONDS ago and never claimed"""
+    folder = incoming_folder()
+    if not os.path.isdir(folder):
+        return
+    now = time.time()
+    for name in os.listdir(folder):
+        upload_id, _, extension = name.partition('.')
+        if extension != 'json':
+            continue
+        try:
+            record = _load(upload_id)
+        except UploadError:
+            continue
+        if now - record['created_at'] > settings['UPLOAD_TTL_SECONDS']:
+            if record.get('filepath'):
+                try:
+                    os.remove(record['filepath'])
+                except OSError:
+                    pass
+            try:
+                discard(upload_id)
+            except UploadError:
+                pass  # still receiving chunks; the next sweep gets it
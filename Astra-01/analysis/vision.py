@@ -0,0 +1,259 @@
+"""
+Object detection (YOLO) and face / hand / pose landmarks (MediaPipe)
+ultralytics (torch), onnxruntime / openvino and mediapipe are imported on first use
+"""
+
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+from . import engines
+from . import metrics
+from . import models
+from . import profiling
+from .config import settings
+from .media import load_image
+
+# YOLO runtimes: 'torch' runs the .pt weights eagerly, 'onnx' (ONNX Runtime) and
+# 'openvino' run a one-time export of them. All return the same ultralytics Results.
+YOLO_BACKENDS = ['torch', 'onnx', 'openvino']
+yolo_models = {}  # yolo_model_name(backend) -> model
+yolo_lock = threading.Lock()
+# ultralytics models are not thread-safe: one inference per runtime at a time
+yolo_inference_locks = {backend: threading.Lock() for backend in YOLO_BACKENDS}
+export_lock = threading.Lock()
+mp_solutions = None
+mp_lock = threading.Lock()
+
+def yolo_model_name(backend):
+    """Lifecycle/metrics name of a YOLO runtime: 'yolo', 'yolo_onnx', 'yolo_onnx_int8', ..."""
+    if backend == 'torch':
+        return 'yolo'
+    return f"yolo_{backend}_int8" if settings['YOLO_INT8'] else f"yolo_{backend}"
+
+def exported_model_path(backend, int8=None):
+    """Cache location of an exported model, named after the weights, runtime and precision"""
+    int8 = settings['YOLO_INT8'] if int8 is None else int8
+    stem = Path(settings['YOLO_WEIGHTS']).stem + ('_int8' if int8 else '')
+    if backend == 'onnx':
+        return os.path.join(settings['YOLO_EXPORT_DIR'], f"{stem}.onnx")
+    return os.path.join(settings['YOLO_EXPORT_DIR'], f"{stem}_openvino_model")
+
+def export_yolo_model(backend, int8=None):
+    """Export the YOLO weights to ONNX or OpenVINO once and return the cached artifact.
+
+    ONNX INT8 applies ONNX Runtime dynamic weight quantization to the cached
+    FP32 export; OpenVINO INT8 uses ultralytics' NNCF post-training quantization.
+    """
+    int8 = settings['YOLO_INT8'] if int8 is None else int8
+    target = exported_model_path(backend, int8)
+    if os.path.exists(target):
+        return target
+
+    source = export_yolo_model('onnx', int8=False) if backend == 'onnx' and int8 else None
+    with export_lock:
+        if os.path.exists(target):
+            return target
+        os.makedirs(settings['YOLO_EXPORT_DIR'], exist_ok=True)
+        with metrics.stage_timer(f'yolo_export_{backend}'):
+            print(f"[INFO] Exporting {settings['YOLO_WEIGHTS']} to {backend}{' (INT8)' if int8 else ''}...")
+            if source is not None:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(source, target + '.tmp', weight_type=QuantType.QUInt8)
+                os.replace(target + '.tmp', target)
+            else:
+                from ultralytics import YOLO
+                exported = YOLO(settings['YOLO_WEIGHTS']).export(
+                    format=backend, imgsz=settings['YOLO_IMGSZ'], int8=int8)
+                # Written next to the weights; moved into the cache only once complete
+                shutil.move(exported, target)
+    return target
+
+def get_yolo_model(backend='torch'):
+    """Load a YOLO runtime on first use, and again after the lifecycle manager unloads it"""
+    name = yolo_model_name(backend)
+    model = yolo_models.get(name)
+    if model is not None:
+        return model
+    with yolo_lock:
+        model = yolo_models.get(name)
+        if model is not None:
+            return model
+        try:
+            rss_before = models.rss_mb()
+            load_start = time.perf_counter()
+            from ultralytics import YOLO
+            if backend == 'torch':
+                model = YOLO(settings['YOLO_WEIGHTS'])
+            else:
+                model = YOLO(export_yolo_model(backend), task='detect')
+            yolo_models[name] = model
+            metrics.record_model_load(name, time.perf_counter() - load_start)
+        except Exception as e:
+            print(f"Error loading YOLO model ({backend}): {e}")
+            return None
+    # Registered outside yolo_lock: registering may unload other models
+    models.loaded(name, lambda: unload_yolo_model(name), rss_before_mb=rss_before)
+    return model
+
+def unload_yolo_model(name='yolo'):
+    with yolo_lock:
+        yolo_models.pop(name, None)
+
+def get_mediapipe_solutions():
+    """Import MediaPipe once; graphs are built per request"""
+    global mp_solutions
+    if mp_solutions is None:
+        with mp_lock:
+            if mp_solutions is None:
+                try:
+                    load_start = time.perf_counter()
+                    from mediapipe import solutions
+                    mp_solutions = solutions
+                    metrics.record_model_load('mediapipe', time.perf_counter() - load_start)
+                except Exception as e:
+                    print(f"Error importing MediaPipe: {e}")
+    return mp_solutions
+
+@metrics.timed('yolo')
+def run_yolo(image_path, backend='torch'):
+    """Detect objects with YOLO on the given runtime; raises if the model can't load or run"""
+    model = get_yolo_model(backend)
+    if model is None:
+        raise RuntimeError(f"Could not load the {backend} YOLO runtime")
+
+    detections = []
+    with models.in_use(yolo_model_name(backend)), yolo_inference_locks[backend]:
+        results = model(image_path, imgsz=settings['YOLO_IMGSZ'], verbose=False)
+    for r in results:
+        # Ultralytics reports preprocess / inference / postprocess milliseconds
+        profiling.annotate(speed_ms=r.speed)
+        for box in r.boxes:
+            detection = {
+                'class': r.names[int(box.cls)],
+                'confidence': float(box.conf),
+                'bbox': box.xyxy[0].tolist()
+            }
+            detections.append(detection)
+    return detections
+
+def detect_objects_yolo(image_path, backend='torch'):
+    """Detect objects in image (file path or BGR array) using YOLO on the given runtime"""
+    try:
+        return run_yolo(image_path, backend)
+    except Exception as e:
+        print(f"Error in object detection: {e}")
+        return []
+
+def detect_objects(image_path):
+    """Detect objects with the profile's object engine; empty when the stage is disabled"""
+    if not engines.enabled('objects'):
+        return []
+    return engines.run('objects', image_path)
+
+def detect_faces(rgb):
+    solutions = get_mediapipe_solutions()
+    with metrics.stage_timer('mediapipe_face'), solutions.face_detection.FaceDetection() as face_detection:
+        with profiling.section('inference'):
+            results = face_detection.process(rgb)
+    return {'face_count': len(results.detections) if results.detections else 0}
+
+def detect_face_boxes(rgb):
+    """Face boxes as [{'bbox': [x1, y1, x2, y2], 'confidence'}] in pixels, for tracking"""
+    solutions = get_mediapipe_solutions()
+    with metrics.stage_timer('mediapipe_face'), solutions.face_detection.FaceDetection() as face_detection:
+        with profiling.section('inference'):
+            results = face_detection.process(rgb)
+    h, w = rgb.shape[:2]
+    faces = []
+    for detection in results.detections or []:
+        box = detection.location_data.relative_bounding_box
+        faces.append({
+            'bbox': [box.xmin * w, box.ymin * h, (box.xmin + box.width) * w, (box.ymin + box.height) * h],
+            'confidence': float(detection.score[0])
+        })
+    return faces
+
+def detect_hands(rgb):
+    solutions = get_mediapipe_solutions()
+    with metrics.stage_timer('mediapipe_hands'), solutions.hands.Hands() as hands:
+        with profiling.section('inference'):
+            results = hands.process(rgb)
+    return {'hand_count': len(results.multi_hand_landmarks) if results.multi_hand_landmarks else 0}
+
+def detect_pose(rgb):
+    solutions = get_mediapipe_solutions()
+    with metrics.stage_timer('mediapipe_pose'), solutions.pose.Pose() as pose:
+        with profiling.section('inference'):
+            results = pose.process(rgb)
+    return {'pose_detected': results.pose_landmarks is not None}
+
+LANDMARK_STAGES = ['face', 'hands', 'pose']
+
+def detect_landmarks(image_path, gated=()):
+    """Detect faces, hands and pose (file path or BGR array) with the profile's landmark engines
+
+    Stages the profile leaves out keep their zero values and are listed under
+    `skipped`; `gated` stages also keep their zero values and are not run.
+    """
+    image = load_image(image_path)
+    if image is None:
+        return merge_landmarks({})
+
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return merge_landmarks({stage: run_landmark_stage(stage, rgb)
+                            for stage in LANDMARK_STAGES if engines.enabled(stage) and stage not in gated})
+
+def run_landmark_stage(stage, rgb):
+    """One landmark engine on an RGB image; None if it fails"""
+    try:
+        return engines.run(stage, rgb)
+    except Exception as e:
+        print(f"Error in {stage} landmark detection: {e}")
+        return None
+
+def merge_landmarks(stage_outputs):
+    """Combine per-stage landmark outputs; missing stages keep their zero values"""
+    landmarks_data = {
+        'face_count': 0,
+        'hand_count': 0,
+        'pose_detected': False
+    }
+    for output in stage_outputs.values():
+        landmarks_data.update(output or {})
+
+    skipped = [stage for stage in LANDMARK_STAGES if not engines.enabled(stage)]
+    if skipped:
+        landmarks_data['skipped'] = skipped
+    return landmarks_data
+
+@metrics.timed('reverse_search')
+def reverse_image_search(image_path):
+    """Reverse image search using Google Images API"""
+    results = {
+        'google_lens': None,
+        'similar_images': [],
+        'web_results': []
+    }
+
+    # Placeholder - a full implementation needs a Google Images, TinEye
+    # or SerpAPI key
+    results['google_lens'] = {
+        'status': 'requires_api_key',
+        'message': 'Configure API keys for full reverse image search'
+    }
+
+    return results
+
+engines.register_engine('objects', 'yolo_torch', detect_objects_yolo, memory_mb=350, cpu_cost=4, load=get_yolo_model)
+engines.register_engine('objects', 'yolo_onnx', lambda image: detect_objects_yolo(image, 'onnx'),
+                        memory_mb=300, cpu_cost=2, load=lambda: get_yolo_model('onnx'))
+engines.register_engine('objects', 'yolo_openvino', lambda image: detect_objects_yolo(image, 'openvino'),
+                        memory_mb=300, cpu_cost=2, load=lambda: get_yolo_model('openvino'))
+engines.register_engine('face', 'mediapipe', detect_faces, memory_mb=40, cpu_cost=1, load=get_mediapipe_solutions)
+engines.register_engine('hands', 'mediapipe', detect_hands, memory_mb=60, cpu_cost=2, load=get_mediapipe_solutions)
+engines.register_engine('pose', 'mediapipe', detect_pose, memory_mb=120, cpu_cost=3, load=get_mediapipe_solutions)
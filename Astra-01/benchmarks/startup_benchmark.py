@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the analysis backends
+Starts each backend in a fresh process, waits for /health and fails if startup time,
+resident memory or eagerly imported heavy libraries regress
+
+Usage:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --backend api_backend_lite --max-seconds 2 --max-rss-mb 150
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKENDS = ['api_backend', 'api_backend_lite']
+
+# Libraries that must only load when a stage first needs them
+HEAVY_MODULES = ['torch', 'ultralytics', 'onnxruntime', 'openvino', 'mediapipe', 'easyocr', 'spacy', 'textblob', 'wikipedia', 'bs4']
+
+def backend_env(port=None):
+    env = dict(os.environ, ASTRA_DEBUG='0', ASTRA_WARMUP='0')
+    if port is not None:
+        env['PORT'] = str(port)
+    return env
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def rss_mb(pid):
+    """Resident set size of a process in MB (Linux /proc, or psutil if installed)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+def eager_heavy_imports(backend):
+    """Heavy modules that end up in sys.modules just from importing the backend"""
+    code = (f"import json, sys; import {backend}; "
+            f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=backend_env(),
+                            capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {backend} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure_cold_start(backend, timeout):
+    """Seconds until /health answers 200, and RSS at that moment"""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, f'{backend}.py'], cwd=ROOT, env=backend_env(port),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{backend} exited with code {proc.returncode} before /health answered")
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as resp:
+                    if resp.status == 200:
+                        break
+            except OSError:
+                pass
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"{backend} did not answer /health within {timeout}s")
+            time.sleep(0.05)
+        return time.perf_counter() - start, rss_mb(proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=BACKENDS, action='append', help='backend to measure (default: all)')
+    parser.add_argument('--runs', type=int, default=3, help='cold starts per backend; the median is reported')
+    parser.add_argument('--max-seconds', type=float, default=5.0, help='fail if median time to /health exceeds this')
+    parser.add_argument('--max-rss-mb', type=float, default=300.0, help='fail if median RSS at /health exceeds this')
+    parser.add_argument('--timeout', type=float, default=120.0, help='give up on a single start after this many seconds')
+    args = parser.parse_args()
+
+    failures = []
+    report = {}
+    for backend in args.backend or BACKENDS:
+        eager = eager_heavy_imports(backend)
+        runs = [measure_cold_start(backend, args.timeout) for _ in range(args.runs)]
+        seconds = statistics.median(run[0] for run in runs)
+        rss_values = [run[1] for run in runs if run[1] is not None]
+        rss = statistics.median(rss_values) if rss_values else None
+        report[backend] = {'seconds_to_health': round(seconds, 3),
+                           'rss_mb': round(rss, 1) if rss is not None else None,
+                           'eager_heavy_imports': eager}
+
+        if eager:
+            failures.append(f"{backend}: heavy modules imported at startup: {', '.join(eager)}")
+        if seconds > args.max_seconds:
+            failures.append(f"{backend}: {seconds:.2f}s to /health exceeds {args.max_seconds}s")
+        if rss is not None and rss > args.max_rss_mb:
+            failures.append(f"{backend}: {rss:.0f} MB RSS exceeds {args.max_rss_mb:.0f} MB")
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        print('\nCold start regressed:')
+        for failure in failures:
+            print(f'  - {failure}')
+        return 1
+    print('\nCold start within budget')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
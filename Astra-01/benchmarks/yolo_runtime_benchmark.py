@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+CPU latency and accuracy of the YOLO runtimes behind the 'objects' engines
+Runs torch, ONNX Runtime and OpenVINO (optionally INT8) over the same images and
+compares each runtime's detections with torch's: same-class boxes matched at
+IoU >= 0.5 give recall/precision against torch and the mean IoU of matches.
+Exported models are cached in YOLO_EXPORT_DIR, so only the first run exports.
+
+Usage:
+    python benchmarks/yolo_runtime_benchmark.py test.png
+    python benchmarks/yolo_runtime_benchmark.py photos/*.jpg --runtime onnx --int8 --min-recall 0.9 --max-latency-ratio 0.8
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2
+
+from analysis import vision
+from analysis.config import settings
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def match(reference, candidate, threshold=0.5):
+    """Greedily pair candidate boxes (highest confidence first) with same-class reference boxes"""
+    used = set()
+    ious = []
+    for det in sorted(candidate, key=lambda d: d['confidence'], reverse=True):
+        best, best_iou = None, threshold
+        for i, ref in enumerate(reference):
+            if i in used or ref['class'] != det['class']:
+                continue
+            overlap = iou(ref['bbox'], det['bbox'])
+            if overlap >= best_iou:
+                best, best_iou = i, overlap
+        if best is not None:
+            used.add(best)
+            ious.append(best_iou)
+    return ious
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_runtime(backend, int8, images, repeats):
+    """Per-image latencies (ms) and the detections of the last pass; inference errors propagate"""
+    settings['YOLO_INT8'] = int8
+    load_start = time.perf_counter()
+    if vision.get_yolo_model(backend) is None:
+        raise RuntimeError(f"Could not load the {backend} runtime")
+    load_seconds = time.perf_counter() - load_start
+
+    vision.run_yolo(images[0], backend)  # first call allocates buffers
+    latencies = []
+    detections = []
+    for _ in range(repeats):
+        detections = []
+        for image in images:
+            start = time.perf_counter()
+            detections.append(vision.run_yolo(image, backend))
+            latencies.append((time.perf_counter() - start) * 1000)
+    vision.unload_yolo_model(vision.yolo_model_name(backend))
+    return latencies, detections, load_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='+', help='images to detect objects in')
+    parser.add_argument('--runtime', choices=vision.YOLO_BACKENDS[1:], action='append',
+                        help='runtime to compare with torch (default: onnx and openvino)')
+    parser.add_argument('--int8', action='store_true', help='also measure INT8-quantized exports')
+    parser.add_argument('--repeats', type=int, default=3, help='passes over the images per runtime')
+    parser.add_argument('--min-recall', type=float, default=0.0, help='fail if a runtime finds fewer of torch\'s boxes')
+    parser.add_argument('--max-latency-ratio', type=float, default=None,
+                        help='fail if a runtime\'s median latency exceeds this fraction of torch\'s')
+    args = parser.parse_args()
+
+    images = []
+    for path in args.images:
+        image = cv2.imread(path)
+        if image is None:
+            parser.error(f"Could not read {path}")
+        images.append(image)
+
+    variants = [('torch', False)]
+    for backend in args.runtime or vision.YOLO_BACKENDS[1:]:
+        variants.append((backend, False))
+        if args.int8:
+            variants.append((backend, True))
+
+    report = {}
+    failures = []
+    reference = None
+    torch_median = None
+    for backend, int8 in variants:
+        label = backend + ('_int8' if int8 else '')
+        try:
+            latencies, detections, load_seconds = run_runtime(backend, int8, images, args.repeats)
+        except Exception as e:
+            report[label] = {'error': str(e)}
+            failures.append(f"{label}: {e}")
+            continue
+
+        median = statistics.median(latencies)
+        entry = {
+            'median_ms': round(median, 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'load_seconds': round(load_seconds, 2),
+            'detections': sum(len(d) for d in detections)
+        }
+        if backend == 'torch':
+            reference = detections
+            torch_median = median
+        elif reference is not None:
+            ious = [value for ref, det in zip(reference, detections) for value in match(ref, det)]
+            reference_count = sum(len(d) for d in reference)
+            entry['speedup'] = round(torch_median / median, 2) if median else None
+            entry['recall_vs_torch'] = round(len(ious) / reference_count, 3) if reference_count else 1.0
+            entry['precision_vs_torch'] = round(len(ious) / entry['detections'], 3) if entry['detections'] else 1.0
+            entry['mean_iou'] = round(statistics.mean(ious), 3) if ious else None
+
+            if reference_count and not entry['detections']:
+                failures.append(f"{label}: no detections where torch found {reference_count}")
+            elif entry['recall_vs_torch'] < args.min_recall:
+                failures.append(f"{label}: recall {entry['recall_vs_torch']} against torch is below {args.min_recall}")
+            if args.max_latency_ratio is not None and median > torch_median * args.max_latency_ratio:
+                failures.append(f"{label}: median {median:.1f} ms is over {args.max_latency_ratio:.0%} of torch's {torch_median:.1f} ms")
+        report[label] = entry
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        print('\nYOLO runtime check failed:')
+        for failure in failures:
+            print(f'  - {failure}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
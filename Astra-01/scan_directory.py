@@ -0,0 +1,13 @@
+"""
+Analyze every image under a directory with the full pipeline, without the HTTP API
+
+Usage:
+    python scan_directory.py /evidence/photos --output scan.jsonl
+    python scan_directory.py /evidence/photos --output scan.parquet --workers 8 --stages exif,gps,camera,hash
+Rerunning the same command after a crash or Ctrl-C resumes from the checkpoint.
+"""
+
+from analysis.scan import main
+
+if __name__ == '__main__':
+    main()